@@ -1,10 +1,52 @@
 # app.py — AegisFS Visualizer
 from __future__ import annotations
 
+import codecs
+
 import streamlit as st
 from client.fs_client import AegisClient
 
-client = AegisClient()
+
+@st.cache_resource
+def get_client() -> AegisClient:
+    # One client per server process: reruns and hot reloads reuse it (and
+    # its metadata cache) instead of rebuilding it on every interaction.
+    return AegisClient()
+
+
+client = get_client()
+
+PREVIEW_BYTES = 4096  # text/binary previews only fetch this much
+MAX_GRAPH_NODES = 64  # block nodes drawn before collapsing into "+N more"
+MAX_JSON_BLOCKS = 64  # block ids listed in the raw metadata view
+PAGE_SIZE = 200       # paths per file-browser page
+
+
+# Streamlit reruns this whole script on every widget interaction; keep the
+# MDS/DataNode lookups behind caches so reruns are memory hits. Listings are
+# keyed by the MDS namespace version, so an unchanged namespace costs one
+# tiny RPC per rerun and any write invalidates them automatically.
+@st.cache_data(max_entries=64, show_spinner=False)
+def _cached_page(prefix: str, page: int, version: str) -> tuple[list[str], int, dict]:
+    # The MDS sorts and pages; we only pull metadata for the visible rows.
+    paths, total = client.list_page(prefix=prefix, offset=page * PAGE_SIZE, limit=PAGE_SIZE)
+    metas = client.metadata_batch(paths) if paths else {}
+    return paths, total, metas
+
+
+# Full payloads are bytes (immutable), so cache_resource can hand back the
+# cached object as-is and skip cache_data's pickle round trip.
+# The fingerprint (size + first block id) changes whenever the file is
+# rewritten, so a stale preview can never be served for new contents.
+@st.cache_resource(ttl=30, max_entries=8, show_spinner=False)
+def _cached_bytes(path: str, fingerprint: str) -> bytes | None:
+    return client.read_bytes(path)
+
+
+@st.cache_data(ttl=30, max_entries=32, show_spinner=False)
+def _cached_head(path: str, fingerprint: str) -> bytes | None:
+    return client.read_range(path, 0, PREVIEW_BYTES)
+
 
 st.set_page_config(
     page_title="AegisFS Visualizer",
@@ -55,23 +97,34 @@ with upload_cols[2]:
     st.write("")
     do_upload = st.button("⬆️ Upload")
 
+# Identifies the selected upload; a repeat click with the same file and
+# target is a no-op instead of a second full transfer.
+upload_key = (uploaded.name, uploaded.size, target_path) if uploaded is not None else None
+
 if do_upload:
     if uploaded is None:
         st.error("No file selected.")
     elif not target_path.startswith("/"):
         st.error("Path must start with '/'.")
+    elif upload_key == st.session_state.get("last_upload_key"):
+        st.info(f"{uploaded.name} is already stored at {target_path}.")
     else:
-        data_bytes = uploaded.getvalue()
         mime = uploaded.type or "application/octet-stream"
-        client.write_bytes(
+        total = uploaded.size or 1
+        progress = st.progress(0.0, text="Uploading…")
+        uploaded.seek(0)
+        meta = client.write_stream(
             target_path,
-            data_bytes,
+            uploaded,
             mime=mime,
             filename=uploaded.name,
+            on_progress=lambda done: progress.progress(min(done / total, 1.0)),
         )
+        progress.empty()
+        st.session_state["last_upload_key"] = upload_key
         st.success(
             f"Uploaded {uploaded.name} → {target_path} "
-            f"({len(data_bytes)} bytes, {mime})"
+            f"({meta['size']} bytes, {mime}, crc32={meta['crc32']:08x})"
         )
 
 st.markdown("---")
@@ -85,17 +138,39 @@ col_left, col_right = st.columns([1, 2], gap="large")
 with col_left:
     st.subheader("Filesystem")
     if st.button("🔄 Refresh file list"):
+        st.cache_data.clear()
         st.experimental_rerun()
 
-    paths = sorted(client.list_paths())
+    prefix = st.text_input("Filter by path prefix", value="")
+    page = int(st.session_state.get("browser_page", 1))
+    version = client.namespace_version()
+    paths, total, metas = _cached_page(prefix, page - 1, version)
+    pages = max(1, -(-total // PAGE_SIZE))
+    if page > pages:
+        # The filter shrank the result set; jump back to the last page.
+        page = pages
+        st.session_state["browser_page"] = page
+        paths, total, metas = _cached_page(prefix, page - 1, version)
+
     if not paths:
-        st.info("Filesystem is empty. Use the demo buttons or upload a file.")
+        if prefix:
+            st.info(f"No files under {prefix!r}.")
+        else:
+            st.info("Filesystem is empty. Use the demo buttons or upload a file.")
         selected_path = None
     else:
-        selected_path = st.radio(
+        if pages > 1:
+            st.number_input(
+                f"Page (of {pages}, {total} files)",
+                min_value=1,
+                max_value=pages,
+                key="browser_page",
+            )
+        selected_path = st.selectbox(
             "Select a file",
             options=paths,
             index=0,
+            format_func=lambda p: f"{p}  ({(metas.get(p) or {}).get('size', 0)} B)",
         )
 
 with col_right:
@@ -103,7 +178,7 @@ with col_right:
     if not selected_path:
         st.write("Select a file on the left to inspect its metadata and block layout.")
     else:
-        meta = client.get_meta(selected_path) or {}
+        meta = metas.get(selected_path) or {}
         size = meta.get("size", 0)
         blocks = meta.get("blocks", []) or []
         num_blocks = len(blocks)
@@ -113,14 +188,18 @@ with col_right:
         m1, m2, m3 = st.columns(3)
         m1.metric("Size (bytes)", f"{size}")
         m2.metric("# of Blocks", f"{num_blocks}")
-        m3.metric("Block Size", f"{client.BLOCK_SIZE} bytes")
+        m3.metric("Block Size", f"{meta.get('block_size', client.LEGACY_BLOCK_SIZE)} bytes")
 
         st.markdown("#### Raw Metadata")
         meta_json = {
             "path": selected_path,
             "size": size,
-            "blocks": blocks,
+            "blocks": blocks[:MAX_JSON_BLOCKS],
         }
+        if num_blocks > MAX_JSON_BLOCKS:
+            # Serializing/rendering thousands of ids on every rerun is the
+            # slow part; the block count metric above still shows the total.
+            meta_json["blocks_truncated"] = num_blocks - MAX_JSON_BLOCKS
         if mime:
             meta_json["mime"] = mime
         if filename:
@@ -131,21 +210,36 @@ with col_right:
         if not blocks:
             st.warning("This file has no blocks recorded.")
         else:
-            dot_lines = [
-                'digraph G {',
-                '  rankdir=LR;',
-                '  node [shape=box, style=filled, color="#0f766e", fontname="monospace"];',
-                f'  file [label="{selected_path}", shape=folder, color="#1d4ed8"];',
-            ]
-            for i, b in enumerate(blocks):
-                dot_lines.append(f'  b{i} [label="{b}"];')
-                dot_lines.append(f'  file -> b{i};')
-            dot_lines.append('}')
-            dot_src = "\n".join(dot_lines)
+            header = (
+                'digraph G {\n'
+                '  rankdir=LR;\n'
+                '  node [shape=box, style=filled, color="#0f766e", fontname="monospace"];\n'
+                f'  file [label="{selected_path}", shape=folder, color="#1d4ed8"];\n'
+            )
+            # Node + edge per block, assembled in a single join. Huge files
+            # collapse the tail into one node so Graphviz stays responsive.
+            body = "".join(
+                f'  b{i} [label="{b}"];\n  file -> b{i};\n'
+                for i, b in enumerate(blocks[:MAX_GRAPH_NODES])
+            )
+            hidden = num_blocks - MAX_GRAPH_NODES
+            if hidden > 0:
+                body += (
+                    f'  more [label="+{hidden} more blocks", style=dashed];\n'
+                    '  file -> more;\n'
+                )
+            dot_src = header + body + '}'
             st.graphviz_chart(dot_src)
 
         st.markdown("#### Preview")
-        data = client.read_bytes(selected_path)
+        is_media = bool(mime) and mime.split("/", 1)[0] in ("image", "audio", "video")
+        # Media widgets need the whole payload; everything else previews
+        # from the first PREVIEW_BYTES only.
+        fingerprint = f"{size}:{blocks[0] if blocks else ''}"
+        if is_media:
+            data = _cached_bytes(selected_path, fingerprint)
+        else:
+            data = _cached_head(selected_path, fingerprint)
 
         if data is None:
             st.warning("File data missing or unreadable.")
@@ -156,11 +250,12 @@ with col_right:
         elif mime and mime.startswith("video/"):
             st.video(data)
         else:
-            # Try to show text; fallback to binary info
+            # Try to show text; fallback to binary info. The incremental
+            # decoder tolerates a multi-byte character cut off at the end.
             try:
-                text = data.decode("utf-8")
+                text = codecs.getincrementaldecoder("utf-8")().decode(data, final=False)
                 preview = text[:2000]
-                if len(text) > len(preview):
+                if len(text) > len(preview) or size > len(data):
                     preview += "\n\n… (truncated for preview) …"
                 st.text(preview)
             except UnicodeDecodeError:
@@ -1,20 +1,24 @@
 # bulk_load.py — quickly populate AegisFS with many files
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from client.fs_client import AegisClient
 
 client = AegisClient()
 
 def main() -> None:
-    # small text files
-    for i in range(1, 51):
-        path = f"/demo/small_{i}.txt"
-        client.write_file(path, f"Small demo file #{i} for AegisFS.\n")
+    # small text files: blocks pipelined, metadata committed in one batch
+    client.write_batch([
+        (f"/demo/small_{i}.txt", f"Small demo file #{i} for AegisFS.\n")
+        for i in range(1, 51)
+    ])
 
-    # larger multi-block files
+    # larger multi-block files, uploaded concurrently
     big_payload = ("AegisFS big demo file line\n" * 2000)
-    for i in range(1, 11):
-        path = f"/demo/big_{i}.txt"
-        client.write_file(path, big_payload)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(
+            lambda i: client.write_file(f"/demo/big_{i}.txt", big_payload),
+            range(1, 11),
+        ))
 
     print("Loaded 50 small + 10 big demo files into AegisFS.")
 
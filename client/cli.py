@@ -9,19 +9,22 @@ Commands:
     aegisfs write <path> <text>        # text file write
     aegisfs read  <path>               # text file read
     aegisfs stat  <path>               # show metadata + blocks
-    aegisfs ls                         # list paths
+    aegisfs ls    [prefix] [--offset N] [--limit N]   # list paths
     aegisfs rm    <path>               # delete file
     aegisfs put   <local> <path>       # upload binary/text file
     aegisfs get   <path> <local>       # download binary/text file
 """
 
 import argparse
-import mimetypes
+import os
 import re
 import sys
-from typing import List
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
 
-from client.fs_client import AegisClient
+if TYPE_CHECKING:
+    # Imported for real in main(), after argparse, so --help and usage
+    # errors don't pay for loading the client stack.
+    from client.fs_client import AegisClient
 
 # ─────────────────────────────────────────────────────────────
 # Styling
@@ -37,41 +40,44 @@ CYAN  = "\033[36m" if USE_COLOR else ""
 RESET = "\033[0m" if USE_COLOR else ""
 
 
-def banner(op: str, detail: str = "") -> None:
+def _title(op: str, detail: str) -> str:
     title = f"AegisFS ▸ {op}"
     if detail:
         title += f" {detail}"
-    width = max(len(title) + 4, 40)
-    line = "─" * width
-    if USE_COLOR:
-        print(f"{CYAN}{line}{RESET}")
-        print(f"{CYAN}│ {BOLD}{title}{RESET}{CYAN} │{RESET}")
-        print(f"{CYAN}{line}{RESET}")
-    else:
-        print(line)
-        print(f"| {title} |")
-        print(line)
+    return title
+
+
+# Output templates, chosen once here rather than re-checked on every call.
+if USE_COLOR:
+    _BANNER_FMT = (f"{CYAN}{{line}}{RESET}\n"
+                   f"{CYAN}│ {BOLD}{{title}}{RESET}{CYAN} │{RESET}\n"
+                   f"{CYAN}{{line}}{RESET}")
+    _INFO_FMT = f"{DIM}… {{}}{RESET}"
+    _OK_FMT = f"{GREEN}✔ {{}}{RESET}"
+    _ERR_FMT = f"{RED}✖ {{}}{RESET}"
+else:
+    _BANNER_FMT = "{line}\n| {title} |\n{line}"
+    _INFO_FMT = "... {}"
+    _OK_FMT = "[OK] {}"
+    _ERR_FMT = "[ERR] {}"
+
+
+def banner(op: str, detail: str = "") -> None:
+    title = _title(op, detail)
+    line = "─" * max(len(title) + 4, 40)
+    print(_BANNER_FMT.format(line=line, title=title))
 
 
 def info(msg: str) -> None:
-    if USE_COLOR:
-        print(f"{DIM}… {msg}{RESET}")
-    else:
-        print(f"... {msg}")
+    print(_INFO_FMT.format(msg))
 
 
 def ok(msg: str) -> None:
-    if USE_COLOR:
-        print(f"{GREEN}✔ {msg}{RESET}")
-    else:
-        print(f"[OK] {msg}")
+    print(_OK_FMT.format(msg))
 
 
 def err(msg: str) -> None:
-    if USE_COLOR:
-        print(f"{RED}✖ {msg}{RESET}")
-    else:
-        print(f"[ERR] {msg}")
+    print(_ERR_FMT.format(msg))
 
 
 # ─────────────────────────────────────────────────────────────
@@ -82,15 +88,34 @@ ANSI_RE = re.compile(r"\x1b\[.*?m")
 
 
 def visible_length(s: str) -> int:
+    # Box lines are normally plain text; skip the regex when there is no ESC.
+    if "\x1b" not in s:
+        return len(s)
     return len(ANSI_RE.sub("", s))
 
 
 def pad_line(content: str, width: int) -> str:
+    if "\x1b" not in content:
+        return content.ljust(width)
     vis = visible_length(content)
     pad = max(0, width - vis)
     return content + (" " * pad)
 
 
+BOX_WIDTH = 60  # total width including borders
+BORDER_FILL = "─" * (BOX_WIDTH - 2)
+BOX_TOP = "┌" + BORDER_FILL + "┐"
+BOX_MID = "│" + BORDER_FILL + "│"
+BOX_BOTTOM = "└" + BORDER_FILL + "┘"
+BOX_INNER = BOX_WIDTH - 3  # content columns between "│ " and "│"
+
+
+def box_line(line: str) -> str:
+    # Box content is plain text, so a format spec pads it; lines that might
+    # carry ANSI codes must go through pad_line instead.
+    return f"│ {line:<{BOX_INNER}}│"
+
+
 # ─────────────────────────────────────────────────────────────
 # Commands
 # ─────────────────────────────────────────────────────────────
@@ -123,96 +148,157 @@ def cmd_stat(c: AegisClient, path: str) -> None:
     mime = meta.get("mime")
     filename = meta.get("filename")
 
-    BOX_WIDTH = 60  # total width including borders
-
-    def inside(line: str) -> str:
-        inner_width = BOX_WIDTH - 2
-        padded = pad_line(line, inner_width - 1)
-        return "│ " + padded + "│"
-
-    print("┌" + "─" * (BOX_WIDTH - 2) + "┐")
-    print(inside("File Metadata"))
-    print("│" + "─" * (BOX_WIDTH - 2) + "│")
-
-    print(inside(f"Path   : {path}"))
-    print(inside(f"Size   : {size}"))
-    print(inside(f"Blocks : {len(blocks)}"))
+    inside = box_line
+    out = [
+        BOX_TOP,
+        inside("File Metadata"),
+        BOX_MID,
+        inside(f"Path   : {path}"),
+        inside(f"Size   : {size}"),
+        inside(f"Blocks : {len(blocks)}"),
+    ]
     if mime:
-        print(inside(f"MIME   : {mime}"))
+        out.append(inside(f"MIME   : {mime}"))
     if filename:
-        print(inside(f"Name   : {filename}"))
+        out.append(inside(f"Name   : {filename}"))
+
+    out.append(inside("Block IDs:"))
+    out.extend(inside(f"  - {b}") for b in blocks)
+    out.append(BOX_BOTTOM)
+
+    # One write for the whole box instead of a print per line.
+    sys.stdout.write("\n".join(out) + "\n")
 
-    print(inside("Block IDs:"))
-    for b in blocks:
-        print(inside(f"  - {b}"))
 
-    print("└" + "─" * (BOX_WIDTH - 2) + "┘")
+LS_WRITE_BATCH = 1024  # ls rows per stdout write
 
 
-def cmd_ls(c: AegisClient) -> None:
+def cmd_ls(c: AegisClient, prefix: str | None = None,
+           offset: int = 0, limit: int | None = None) -> None:
     banner("ls")
-    paths = sorted(c.list_paths())
-    if not paths:
-        if USE_COLOR:
-            print(DIM + "(empty filesystem)" + RESET)
-        else:
-            print("(empty filesystem)")
+    # Sorted (and optionally filtered/paged) by the MDS, metadata included.
+    metas = c.list_with_meta(sort=True, prefix=prefix, offset=offset, limit=limit)
+    if not metas:
+        # Without a prefix or a page past the start, nothing listed means
+        # nothing stored. DIM/BOLD/RESET are empty strings when color is off.
+        unfiltered = not prefix and offset == 0 and limit != 0
+        print(DIM + ("(empty filesystem)" if unfiltered else "(no paths match)") + RESET)
         return
 
     header = f"{'PATH':<32} {'SIZE':>10} {'BLOCKS':>8}"
     sep = "-" * len(header)
-    if USE_COLOR:
-        print(BOLD + header + RESET)
-    else:
-        print(header)
-    print(sep)
-
-    for p in paths:
-        meta = c.get_meta(p) or {}
+    # Rows go out LS_WRITE_BATCH at a time: few writes, bounded buffer.
+    rows = [BOLD + header + RESET + "\n", sep + "\n"]
+    for p, meta in metas.items():
+        meta = meta or {}
         size = meta.get("size", 0)
         blocks = len(meta.get("blocks", []) or [])
-        print(f"{p:<32} {size:>10} {blocks:>8}")
+        rows.append(f"{p:<32} {size:>10} {blocks:>8}\n")
+        if len(rows) >= LS_WRITE_BATCH:
+            sys.stdout.writelines(rows)
+            rows = []
+    sys.stdout.writelines(rows)
+    sys.stdout.flush()
 
 
 def cmd_rm(c: AegisClient, path: str) -> None:
     banner("rm", path)
-    meta = c.get_meta(path)
-    if not meta:
+    if not c.delete_file(path):
         err(f"file not found: {path}")
         return
-    c.delete_file(path)
     ok("delete complete")
 
 
+class _LocalFileError(Exception):
+    """An OSError from the local file in put/get, not from an RPC."""
+
+
+class _LocalFile:
+    """
+    The local file as the client sees it. Network failures are OSErrors
+    too, so the local file's own errors are re-raised as _LocalFileError
+    to keep the two apart.
+    """
+
+    def __init__(self, f: Any) -> None:
+        self._f = f
+
+    def readinto(self, buf: Any) -> int:
+        try:
+            return self._f.readinto(buf)
+        except OSError as e:
+            raise _LocalFileError(e) from e
+
+    def write(self, data: Any) -> int:
+        try:
+            return self._f.write(data)
+        except OSError as e:
+            raise _LocalFileError(e) from e
+
+
+def _discard(local: str) -> None:
+    # Remove a partial download. Only regular files: get may have been
+    # pointed at a device such as /dev/null.
+    if os.path.isfile(local):
+        try:
+            os.unlink(local)
+        except OSError:
+            pass
+
+
 def cmd_put(c: AegisClient, local: str, path: str) -> None:
-    import os
     banner("put", f"{local} → {path}")
     try:
-        with open(local, "rb") as f:
-            data = f.read()
+        f = open(local, "rb")
     except OSError as e:
         err(f"failed to read local file: {e}")
         return
 
-    info(f"uploading {len(data)} bytes")
-    mime, _ = mimetypes.guess_type(local)
-    c.write_bytes(path, data, mime=mime, filename=os.path.basename(local))
+    # Streamed from the open file: memory use stays flat for any file size.
+    with f:
+        info(f"uploading {os.fstat(f.fileno()).st_size} bytes")
+        # Only put needs mimetypes, so it is imported here. Its built-in table
+        # answers common extensions without guess_type() first parsing the
+        # system mime.types database.
+        import mimetypes
+        ext = os.path.splitext(local)[1].lower()
+        mime = mimetypes.types_map.get(ext) or mimetypes.guess_type(local)[0]
+        try:
+            c.write_stream(path, _LocalFile(f), mime=mime, filename=os.path.basename(local))
+        except _LocalFileError as e:
+            err(f"failed to read local file: {e}")
+            return
     ok("upload complete")
 
 
 def cmd_get(c: AegisClient, path: str, local: str) -> None:
     banner("get", f"{path} → {local}")
-    data = c.read_bytes(path)
-    if data is None:
+    meta = c.get_meta(path)
+    if not meta:
         err(f"file not found or unreadable: {path}")
         return
-    info(f"downloading {len(data)} bytes")
+    info(f"downloading {meta.get('size', 0)} bytes")
     try:
-        with open(local, "wb") as f:
-            f.write(data)
+        f = open(local, "wb")
     except OSError as e:
         err(f"failed to write local file: {e}")
         return
+    # Written as blocks arrive; a download that fails part way leaves no
+    # partial file behind.
+    try:
+        with f:
+            written = c.read_into(path, _LocalFile(f))
+    except _LocalFileError as e:
+        _discard(local)
+        err(f"failed to write local file: {e}")
+        return
+    except BaseException:
+        _discard(local)
+        raise
+    if written is None:
+        _discard(local)
+        err(f"file not found or unreadable: {path}")
+        return
     ok("download complete")
 
 
@@ -220,50 +306,100 @@ def cmd_get(c: AegisClient, path: str, local: str) -> None:
 # Entry Point
 # ─────────────────────────────────────────────────────────────
 
-def main() -> None:
-    parser = argparse.ArgumentParser(prog="aegisfs", description="AegisFS command-line client")
-    sub = parser.add_subparsers(dest="cmd", required=True)
+def _add_write(sub: Any) -> None:
+    p = sub.add_parser("write", help="write a text file")
+    p.add_argument("path")
+    p.add_argument("text")
+
+
+def _add_read(sub: Any) -> None:
+    p = sub.add_parser("read", help="read a text file")
+    p.add_argument("path")
 
-    p_write = sub.add_parser("write", help="write a text file")
-    p_write.add_argument("path")
-    p_write.add_argument("text")
 
-    p_read = sub.add_parser("read", help="read a text file")
-    p_read.add_argument("path")
+def _add_stat(sub: Any) -> None:
+    p = sub.add_parser("stat", help="show file metadata")
+    p.add_argument("path")
 
-    p_stat = sub.add_parser("stat", help="show file metadata")
-    p_stat.add_argument("path")
 
-    sub.add_parser("ls", help="list all paths")
+def _add_ls(sub: Any) -> None:
+    p = sub.add_parser("ls", help="list all paths")
+    p.add_argument("prefix", nargs="?", default=None, help="only paths starting with this")
+    p.add_argument("--offset", type=int, default=0, help="skip this many paths")
+    p.add_argument("--limit", type=int, default=None, help="show at most this many paths")
 
-    p_rm = sub.add_parser("rm", help="delete a file")
-    p_rm.add_argument("path")
 
-    p_put = sub.add_parser("put", help="upload a local file into AegisFS")
-    p_put.add_argument("local")
-    p_put.add_argument("path")
+def _add_rm(sub: Any) -> None:
+    p = sub.add_parser("rm", help="delete a file")
+    p.add_argument("path")
 
-    p_get = sub.add_parser("get", help="download a file from AegisFS")
-    p_get.add_argument("path")
-    p_get.add_argument("local")
+
+def _add_put(sub: Any) -> None:
+    p = sub.add_parser("put", help="upload a local file into AegisFS")
+    p.add_argument("local")
+    p.add_argument("path")
+
+
+def _add_get(sub: Any) -> None:
+    p = sub.add_parser("get", help="download a file from AegisFS")
+    p.add_argument("path")
+    p.add_argument("local")
+
+
+# Subcommand registrars, in help order.
+_SUBCOMMANDS: Dict[str, Callable[[Any], None]] = {
+    "write": _add_write,
+    "read": _add_read,
+    "stat": _add_stat,
+    "ls": _add_ls,
+    "rm": _add_rm,
+    "put": _add_put,
+    "get": _add_get,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="aegisfs", description="AegisFS command-line client")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    # Only the subcommand being run is registered; -h, no command or an
+    # unknown one registers them all so help and errors stay complete.
+    argv = sys.argv[1:]
+    wanted = argv[0] if argv and argv[0] in _SUBCOMMANDS else None
+    for name, register in _SUBCOMMANDS.items():
+        if wanted is None or name == wanted:
+            register(sub)
 
     args = parser.parse_args()
+
+    # -h and usage errors exit inside parse_args(), before the client is
+    # imported or built; the client itself connects on its first RPC.
+    from client.fs_client import AegisClient
     c = AegisClient()
 
-    if args.cmd == "write":
-        cmd_write(c, args.path, args.text)
-    elif args.cmd == "read":
-        cmd_read(c, args.path)
-    elif args.cmd == "stat":
-        cmd_stat(c, args.path)
-    elif args.cmd == "ls":
-        cmd_ls(c)
-    elif args.cmd == "rm":
-        cmd_rm(c, args.path)
-    elif args.cmd == "put":
-        cmd_put(c, args.local, args.path)
-    elif args.cmd == "get":
-        cmd_get(c, args.path, args.local)
+    # A TTY stdout is line-buffered (one write syscall per printed line).
+    # A long listing goes out in large writes instead; other commands keep
+    # line buffering so their progress lines show while they run.
+    if args.cmd == "ls" and sys.stdout.isatty() and hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
+
+    try:
+        if args.cmd == "write":
+            cmd_write(c, args.path, args.text)
+        elif args.cmd == "read":
+            cmd_read(c, args.path)
+        elif args.cmd == "stat":
+            cmd_stat(c, args.path)
+        elif args.cmd == "ls":
+            cmd_ls(c, args.prefix, args.offset, args.limit)
+        elif args.cmd == "rm":
+            cmd_rm(c, args.path)
+        elif args.cmd == "put":
+            cmd_put(c, args.local, args.path)
+        elif args.cmd == "get":
+            cmd_get(c, args.path, args.local)
+    finally:
+        c.close()
 
 
 if __name__ == "__main__":
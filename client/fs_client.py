@@ -4,96 +4,400 @@ Client Library for AegisFS (binary-safe, multi-block)
 
 from __future__ import annotations
 
-import base64
-import socket
-from typing import Any, Dict, List
-from uuid import uuid4
+import io
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
 
-from common.rpc import RpcConnection
+from common.lru_cache import ClockCache
+from common.rpc import Blob, RpcConnectionPool
+
+
+def _copy_meta(value: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A copy of file metadata that shares nothing mutable with value. The
+    block id list is its only container; everything else is a scalar.
+    """
+    copy = dict(value)
+    blocks = copy.get("blocks")
+    if isinstance(blocks, list):
+        copy["blocks"] = list(blocks)
+    return copy
+
+
+class _MetaCache:
+    """
+    Bounded pseudo-LRU (CLOCK) of path -> metadata with a per-entry expiry.
+
+    Lets "stat then act" sequences and Streamlit reruns skip the MDS round
+    trip; the short TTL bounds how stale another client's writes can look.
+    Values are copied in and out, so callers may change what they pass to
+    put() or get back from get() without touching the cached entry.
+    """
+
+    def __init__(self, limit: int, ttl: float) -> None:
+        self.limit = limit
+        self.ttl = ttl
+        self._entries = ClockCache(limit) if limit > 0 else None
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Dict[str, Any] | None:
+        if self._entries is None:
+            return None
+        with self._lock:
+            hit = self._entries.get(path)
+            if hit is None:
+                return None
+            expires, value = hit
+            if expires < time.monotonic():
+                self._entries.pop(path)
+                return None
+        return _copy_meta(value)
+
+    def put(self, path: str, value: Dict[str, Any]) -> None:
+        if self._entries is None:
+            return
+        entry = (time.monotonic() + self.ttl, _copy_meta(value))
+        with self._lock:
+            self._entries.put(path, entry)
+
+    def invalidate(self, path: str) -> None:
+        if self._entries is None:
+            return
+        with self._lock:
+            self._entries.pop(path)
 
 
 class AegisClient:
     """
     High-level client for AegisFS.
-    Supports multi-block text and binary files via base64-encoded blocks.
+    Supports multi-block text and binary files; blocks travel as raw RPC blobs.
     """
 
-    BLOCK_SIZE = 4096  # bytes per block
+    BLOCK_SIZE = 1 << 20  # default bytes per block for new files
+    LEGACY_BLOCK_SIZE = 4096  # files whose metadata has no "block_size"
+    MAX_INFLIGHT = 8   # concurrent block RPCs per transfer
+    RPC_BATCH_BYTES = 1 << 20  # block payload carried by one bulk DataNode RPC
+    DELETE_BATCH_MAX = 4096    # block ids per delete_blocks RPC
+    META_BATCH_MAX = 256  # metadata entries per put_meta_batch RPC
+    META_FANOUT = 16      # concurrent get_meta RPCs when batching is unavailable
+    MAX_IDLE_CONNS = 16   # kept-alive connections retained per server
 
     def __init__(self, mds_host: str = "127.0.0.1", mds_port: int = 9000,
-                 dn_host: str = "127.0.0.1", dn_port: int = 9101) -> None:
+                 dn_host: str = "127.0.0.1", dn_port: int = 9101,
+                 meta_cache_limit: int = 4096,
+                 meta_cache_ttl: float = 2.0,
+                 block_size: int | None = None) -> None:
+        if block_size is not None and block_size <= 0:
+            raise ValueError(f"block_size must be positive, got {block_size}")
         self.mds_host = mds_host
         self.mds_port = mds_port
         self.dn_host = dn_host
         self.dn_port = dn_port
+        # Block size for files this client writes; every file records its own
+        # in its metadata, so readers never depend on this setting.
+        self.block_size = block_size or self.BLOCK_SIZE
+        self._meta_cache = _MetaCache(meta_cache_limit, meta_cache_ttl)
+        self._pool = RpcConnectionPool(self.MAX_IDLE_CONNS)
 
     # ------------------------------------------------------------
     # Low-level RPC helpers
     # ------------------------------------------------------------
+    def _rpc(self, addr: Tuple[str, int], msg: Dict[str, Any],
+             blob: Blob | None = None) -> Tuple[Dict[str, Any], bytes]:
+        return self._pool.call(addr, msg, blob)
+
     def _mds_rpc(self, msg: Dict[str, Any]) -> Dict[str, Any]:
-        with socket.create_connection((self.mds_host, self.mds_port)) as s:
-            conn = RpcConnection(s)
-            conn.send(msg)
-            return conn.recv()
+        return self._rpc((self.mds_host, self.mds_port), msg)[0]
+
+    def _dn_rpc(self, msg: Dict[str, Any],
+                blob: Blob | None = None) -> Tuple[Dict[str, Any], bytes]:
+        """DataNode round trip; block payloads travel as raw RPC blobs."""
+        return self._rpc((self.dn_host, self.dn_port), msg, blob)
 
-    def _dn_rpc(self, msg: Dict[str, Any]) -> Dict[str, Any]:
-        with socket.create_connection((self.dn_host, self.dn_port)) as s:
-            conn = RpcConnection(s)
-            conn.send(msg)
-            return conn.recv()
+    def close(self) -> None:
+        """Close all idle kept-alive connections."""
+        self._pool.close()
 
     # ------------------------------------------------------------
     # Metadata operations
     # ------------------------------------------------------------
     def get_meta(self, path: str) -> Dict[str, Any] | None:
+        cached = self._meta_cache.get(path)
+        if cached is not None:
+            return cached
         resp = self._mds_rpc({"op": "get_meta", "args": {"path": path}})
         if not resp.get("ok", True):
             return None
-        return resp.get("value")
+        value = resp.get("value")
+        if value is not None:
+            self._meta_cache.put(path, value)
+        return value
+
+    def metadata_batch(self, paths: List[str]) -> Dict[str, Dict[str, Any] | None]:
+        """
+        Fetch metadata for many paths in one MDS round trip.
+        Missing paths map to None.
+        """
+        paths = list(paths)
+        resp = self._mds_rpc({"op": "metadata_batch", "args": {"paths": paths}})
+        if not resp.get("ok", False):
+            if str(resp.get("error", "")).startswith("unknown_op"):
+                # Older MDS without the batch op: fan out instead, in order.
+                with ThreadPoolExecutor(max_workers=self.META_FANOUT) as pool:
+                    return dict(zip(paths, pool.map(self.get_meta, paths)))
+            return {}
+        values = resp.get("values", {})
+        for p, value in values.items():
+            if value is not None:
+                self._meta_cache.put(p, value)
+        return values
 
     def put_meta(self, path: str, value: Dict[str, Any]) -> None:
         resp = self._mds_rpc({"op": "put_meta", "args": {"path": path, "value": value}})
         if not resp.get("ok", False):
+            self._meta_cache.invalidate(path)
             raise RuntimeError(f"MDS put_meta failed: {resp}")
+        self._meta_cache.put(path, value)
+
+    def put_meta_batch(self, items: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Commit metadata for many paths, META_BATCH_MAX entries per RPC.
+        Each RPC is one atomic MDS transaction.
+        """
+        paths = list(items)
+        for start in range(0, len(paths), self.META_BATCH_MAX):
+            chunk = {p: items[p] for p in paths[start: start + self.META_BATCH_MAX]}
+            resp = self._mds_rpc({"op": "put_meta_batch", "args": {"items": chunk}})
+            if not resp.get("ok", False):
+                for p in chunk:
+                    self._meta_cache.invalidate(p)
+                raise RuntimeError(f"MDS put_meta_batch failed: {resp}")
+            for p, value in chunk.items():
+                self._meta_cache.put(p, value)
 
     # ------------------------------------------------------------
-    # Block operations (binary-safe via base64)
+    # Block operations (binary-safe via raw RPC blobs)
     # ------------------------------------------------------------
     def store_block(self, block_id: str, data: bytes) -> None:
-        data_b64 = base64.b64encode(data).decode("ascii")
-        resp = self._dn_rpc({
+        resp, _ = self._dn_rpc({
             "op": "store_block",
-            "args": {"block_id": block_id, "data_b64": data_b64},
-        })
+            "args": {"block_id": block_id},
+        }, data)
         if not resp.get("ok", False):
             raise RuntimeError(f"DataNode store_block failed: {resp}")
 
     def read_block(self, block_id: str) -> bytes | None:
-        resp = self._dn_rpc({
+        resp, data = self._dn_rpc({
             "op": "read_block",
             "args": {"block_id": block_id},
         })
         if not resp.get("ok", False):
             return None
-        data_b64 = resp["data_b64"]
-        return base64.b64decode(data_b64.encode("ascii"))
+        return bytes(data)
+
+    def _parallel(self, fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """
+        Apply fn to every item with up to MAX_INFLIGHT concurrent calls.
+        Results come back in item order; the first exception is re-raised.
+        """
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.MAX_INFLIGHT, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    @staticmethod
+    def _block_ids() -> Iterator[str]:
+        """
+        Endless fresh block ids ("b_" + 8 hex digits). Randomness is drawn
+        from os.urandom once per 256 ids rather than once per block.
+        """
+        while True:
+            pool = os.urandom(4 * 256).hex()
+            for i in range(0, len(pool), 8):
+                yield "b_" + pool[i: i + 8]
+
+    def _store_pipelined(self, pieces: Iterable[bytes]) -> List[str]:
+        """
+        Store pieces as consecutive blocks. Pieces are grouped into
+        store_blocks RPCs of about RPC_BATCH_BYTES each, with up to
+        MAX_INFLIGHT RPCs in flight. Returns the block ids in file order once
+        every store has succeeded; the first failure is re-raised.
+        """
+        blocks: List[str] = []
+        ids = self._block_ids()
+        inflight: deque = deque()
+        batch: List[Tuple[str, bytes]] = []
+        batch_bytes = 0
+        # Created on the first full batch that has more data behind it, so
+        # writes that fit in one RPC run inline without starting threads.
+        pool: ThreadPoolExecutor | None = None
+        try:
+            for piece in pieces:
+                if batch_bytes >= self.RPC_BATCH_BYTES:
+                    if pool is None:
+                        pool = ThreadPoolExecutor(max_workers=self.MAX_INFLIGHT)
+                    inflight.append(pool.submit(self.store_blocks, batch))
+                    batch, batch_bytes = [], 0
+                    if len(inflight) >= self.MAX_INFLIGHT:
+                        inflight.popleft().result()
+                block_id = next(ids)
+                blocks.append(block_id)
+                batch.append((block_id, piece))
+                batch_bytes += len(piece)
+            if batch:
+                if pool is None:
+                    self.store_blocks(batch)
+                else:
+                    inflight.append(pool.submit(self.store_blocks, batch))
+            while inflight:
+                inflight.popleft().result()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+        return blocks
+
+    def store_blocks(self, items: List[Tuple[str, bytes]]) -> None:
+        """Store many (block_id, data) pairs in one DataNode round trip."""
+        resp, _ = self._dn_rpc({
+            "op": "store_blocks",
+            "args": {
+                "block_ids": [block_id for block_id, _ in items],
+                "sizes": [len(data) for _, data in items],
+            },
+        }, [data for _, data in items])
+        if not resp.get("ok", False):
+            raise RuntimeError(f"DataNode store_blocks failed: {resp}")
+
+    def read_blocks(self, block_ids: List[str]) -> List[bytes | None]:
+        """Read many blocks in one round trip; missing blocks come back as None."""
+        return [None if v is None else bytes(v) for v in self._read_block_views(block_ids)]
+
+    def _read_block_views(self, block_ids: List[str]) -> List[memoryview | None]:
+        """read_blocks, returning zero-copy views into the received blob."""
+        resp, blob = self._dn_rpc({"op": "read_blocks", "args": {"block_ids": block_ids}})
+        if not resp.get("ok", False):
+            return [None] * len(block_ids)
+        view = memoryview(blob)
+        out: List[memoryview | None] = []
+        offset = 0
+        for size in resp["sizes"]:
+            if size is None:
+                out.append(None)
+            else:
+                out.append(view[offset:offset + size])
+                offset += size
+        return out
+
+    def delete_blocks(self, block_ids: List[str]) -> None:
+        resp, _ = self._dn_rpc({"op": "delete_blocks", "args": {"block_ids": block_ids}})
+        if not resp.get("ok", False):
+            raise RuntimeError(f"DataNode delete_blocks failed: {resp}")
+
+    def _block_groups(self, block_ids: List[str], block_size: int) -> List[List[str]]:
+        """Split block ids into groups of about RPC_BATCH_BYTES each."""
+        per_rpc = max(1, self.RPC_BATCH_BYTES // block_size)
+        return [block_ids[i: i + per_rpc] for i in range(0, len(block_ids), per_rpc)]
+
+    def _fetch_blocks(self, block_ids: List[str], block_size: int) -> List[memoryview | None]:
+        """Block views in RPC_BATCH_BYTES-sized read_blocks groups, groups in parallel."""
+        groups = self._block_groups(block_ids, block_size)
+        return [chunk for group in self._parallel(self._read_block_views, groups) for chunk in group]
 
     # ------------------------------------------------------------
     # High-level file API (bytes-first)
     # ------------------------------------------------------------
-    def write_bytes(self, path: str, data: bytes,
+    def write_bytes(self, path: str, data: bytes | BinaryIO,
                     mime: str | None = None,
                     filename: str | None = None) -> None:
-        blocks: List[str] = []
-        for offset in range(0, len(data), self.BLOCK_SIZE):
-            chunk = data[offset: offset + self.BLOCK_SIZE]
-            block_id = f"b_{uuid4().hex[:8]}"
-            self.store_block(block_id, chunk)
-            blocks.append(block_id)
+        """
+        Store data as a file. data may be bytes-like or a readable binary
+        file object; file objects are streamed via write_stream.
+        """
+        if hasattr(data, "read"):
+            self.write_stream(path, data, mime=mime, filename=filename)
+            return
+
+        # memoryview slices share the caller's buffer: no per-block copy.
+        view = memoryview(data).cast("B")
+        if not view:
+            blocks: List[str] = []
+        elif len(view) <= self.block_size:
+            blocks = self._store_pipelined([view])
+        else:
+            blocks = self._store_pipelined(
+                view[offset: offset + self.block_size]
+                for offset in range(0, len(view), self.block_size)
+            )
+
+        meta: Dict[str, Any] = {
+            "blocks": blocks,
+            "size": len(view),
+            "block_size": self.block_size,
+        }
+        if mime:
+            meta["mime"] = mime
+        if filename:
+            meta["filename"] = filename
+
+        self.put_meta(path, meta)
+
+    def write_stream(self, path: str, reader: BinaryIO,
+                     mime: str | None = None,
+                     filename: str | None = None,
+                     chunk_size: int = 1 << 20,
+                     on_progress: Callable[[int], None] | None = None) -> Dict[str, Any]:
+        """
+        Upload from a file-like object without materializing it in memory.
+
+        Reads chunk_size bytes at a time (readinto a fresh buffer when the
+        reader supports it), stores each block_size slice of it as a
+        zero-copy view and keeps a rolling CRC32. Metadata is committed only after
+        every block is stored; the committed metadata dict is returned.
+        on_progress, if given, receives the running byte count.
+        """
+        size = 0
+        crc = 0
+
+        def pieces() -> Iterator[memoryview]:
+            nonlocal size, crc
+            readinto = getattr(reader, "readinto", None)
+            tail = b""  # bytes short of a full block, carried into the next buffer
+            while True:
+                # A fresh buffer per chunk: yielded views may still be in flight.
+                buf = memoryview(bytearray(len(tail) + chunk_size))
+                buf[:len(tail)] = tail
+                if readinto is not None:
+                    n = readinto(buf[len(tail):]) or 0
+                else:
+                    chunk = reader.read(chunk_size)
+                    n = len(chunk)
+                    buf[len(tail): len(tail) + n] = chunk
+                if not n:
+                    break
+                size += n
+                crc = zlib.crc32(buf[len(tail): len(tail) + n], crc)
+                end = len(tail) + n
+                full = end - end % self.block_size
+                for offset in range(0, full, self.block_size):
+                    yield buf[offset: offset + self.block_size]
+                tail = bytes(buf[full:end])
+                if on_progress is not None:
+                    on_progress(size)
+            if tail:
+                yield memoryview(tail)
+
+        blocks = self._store_pipelined(pieces())
 
         meta: Dict[str, Any] = {
             "blocks": blocks,
-            "size": len(data),
+            "size": size,
+            "block_size": self.block_size,
+            "crc32": crc,
         }
         if mime:
             meta["mime"] = mime
@@ -101,22 +405,112 @@ class AegisClient:
             meta["filename"] = filename
 
         self.put_meta(path, meta)
+        return meta
 
     def read_bytes(self, path: str) -> bytes | None:
+        # Each block group is copied into one growing buffer as it arrives and
+        # then released, instead of holding every block until a final join;
+        # getvalue() hands over the buffer without copying it again.
+        buf = io.BytesIO()
+        if self.read_into(path, buf) is None:
+            return None
+        return buf.getvalue()
+
+    def read_into(self, path: str, out: BinaryIO) -> int | None:
+        """
+        Download path into the writable file-like out without materializing
+        it in memory: block groups are fetched with up to MAX_INFLIGHT RPCs in
+        flight and written in file order as they complete.
+
+        Returns the number of bytes written, or None if the file or one of
+        its blocks is missing (out may then hold a partial prefix).
+        """
+        meta = self.get_meta(path)
+        if not meta:
+            return None
+        groups = self._block_groups(meta.get("blocks", []),
+                                    meta.get("block_size", self.LEGACY_BLOCK_SIZE))
+        written = 0
+
+        def write_group(chunks: List[memoryview | None]) -> bool:
+            nonlocal written
+            for chunk in chunks:
+                if chunk is None:
+                    return False
+                out.write(chunk)
+                written += len(chunk)
+            return True
+
+        if len(groups) <= 1:
+            # At most one RPC: skip the pool.
+            for group in groups:
+                if not write_group(self._read_block_views(group)):
+                    return None
+            return written
+
+        inflight: deque = deque()
+        with ThreadPoolExecutor(max_workers=self.MAX_INFLIGHT) as pool:
+            for group in groups:
+                inflight.append(pool.submit(self._read_block_views, group))
+                if len(inflight) < self.MAX_INFLIGHT:
+                    continue
+                if not write_group(inflight.popleft().result()):
+                    return None
+            while inflight:
+                if not write_group(inflight.popleft().result()):
+                    return None
+        return written
+
+    def write_batch(self, items: List[Tuple[str, str | bytes]]) -> None:
+        """
+        Write many small files at once: all of their blocks go through one
+        pipelined store, then the metadata is committed in batched MDS RPCs
+        instead of one put_meta per file. str payloads are UTF-8 encoded.
+        """
+        payloads = [
+            (path, data.encode("utf-8") if isinstance(data, str) else data)
+            for path, data in items
+        ]
+        blocks = self._store_pipelined(
+            memoryview(data)[offset: offset + self.block_size]
+            for _, data in payloads
+            for offset in range(0, len(data), self.block_size)
+        )
+
+        metas: Dict[str, Dict[str, Any]] = {}
+        pos = 0
+        for path, data in payloads:
+            n = -(-len(data) // self.block_size)
+            metas[path] = {
+                "blocks": blocks[pos: pos + n],
+                "size": len(data),
+                "block_size": self.block_size,
+            }
+            pos += n
+        self.put_meta_batch(metas)
+
+    def read_range(self, path: str, offset: int = 0,
+                   length: int | None = None) -> bytes | None:
+        """
+        Read [offset, offset+length) of a file, fetching only the blocks
+        that intersect the range. length=None reads to end of file.
+        """
         meta = self.get_meta(path)
         if not meta:
             return None
-        blocks: List[str] = meta.get("blocks", [])
-        if not blocks:
+        size = meta.get("size", 0)
+        block_size = meta.get("block_size", self.LEGACY_BLOCK_SIZE)
+        end = size if length is None else min(size, offset + length)
+        if offset >= end:
             return b""
 
-        pieces: List[bytes] = []
-        for block_id in blocks:
-            chunk = self.read_block(block_id)
-            if chunk is None:
-                return None
-            pieces.append(chunk)
-        return b"".join(pieces)
+        first = offset // block_size
+        last = (end - 1) // block_size
+        pieces = self._fetch_blocks(meta.get("blocks", [])[first: last + 1], block_size)
+        if any(chunk is None for chunk in pieces):
+            return None
+        start = offset - first * block_size
+        return b"".join(pieces)[start: start + (end - offset)]
 
     # ------------------------------------------------------------
     # Text convenience API on top of bytes
@@ -134,22 +528,95 @@ class AegisClient:
     # Extra helpers for CLI
     # ------------------------------------------------------------
     def delete_block(self, block_id: str) -> None:
-        resp = self._dn_rpc({"op": "delete_block", "args": {"block_id": block_id}})
+        resp, _ = self._dn_rpc({"op": "delete_block", "args": {"block_id": block_id}})
         if not resp.get("ok", False):
             raise RuntimeError(f"DataNode delete_block failed: {resp}")
 
-    def list_paths(self) -> list[str]:
-        resp = self._mds_rpc({"op": "list_meta", "args": {}})
+    def list_paths(self, sort: bool = False, prefix: str | None = None,
+                   offset: int = 0, limit: int | None = None) -> list[str]:
+        """
+        List paths. With sort/prefix/offset/limit the MDS sorts, filters and
+        pages the namespace itself, so only the requested slice is sent.
+        """
+        if not sort and prefix is None and offset == 0 and limit is None:
+            resp = self._mds_rpc({"op": "list_meta", "args": {}})
+            if not resp.get("ok", False):
+                return []
+            return resp.get("paths", [])
+        return self.list_page(prefix=prefix or "", offset=offset, limit=limit)[0]
+
+    def list_page(self, prefix: str = "", offset: int = 0,
+                  limit: int | None = None) -> Tuple[List[str], int]:
+        """
+        Return (sorted paths, total) for one page of the paths under prefix;
+        total counts every match, not just the returned page.
+        """
+        args: Dict[str, Any] = {"sorted": True, "prefix": prefix, "offset": offset}
+        if limit is not None:
+            args["limit"] = limit
+        resp = self._mds_rpc({"op": "list_meta", "args": args})
         if not resp.get("ok", False):
-            return []
-        return resp.get("paths", [])
+            return [], 0
+        paths = resp.get("paths", [])
+        return paths, resp.get("total", len(paths))
 
-    def delete_file(self, path: str) -> None:
-        meta = self.get_meta(path)
-        if not meta:
-            return
-        for b in meta.get("blocks", []):
-            self.delete_block(b)
+    def namespace_version(self) -> str:
+        """
+        Opaque token that changes on every metadata mutation; use it to
+        key caches of listings (ETag-style).
+        """
+        resp = self._mds_rpc({"op": "namespace_version", "args": {}})
+        if not resp.get("ok", False):
+            return ""
+        return resp.get("version", "")
+
+    def list_with_meta(self, sort: bool = False, prefix: str | None = None,
+                       offset: int = 0, limit: int | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Return {path: metadata} in one MDS round trip: the whole namespace,
+        or with sort/prefix/offset/limit one sorted page of it, in order.
+        """
+        paged = sort or prefix is not None or offset != 0 or limit is not None
+        args: Dict[str, Any] = {}
+        if paged:
+            args = {"sorted": True, "prefix": prefix or "", "offset": offset}
+            if limit is not None:
+                args["limit"] = limit
+        resp = self._mds_rpc({"op": "list_with_meta", "args": args})
+        if paged and (str(resp.get("error", "")).startswith("unknown_op") or
+                      (resp.get("ok") and "total" not in resp)):
+            # Older MDS without (paged) list_with_meta: list, then stat in bulk.
+            paths = self.list_paths(sort=True, prefix=prefix, offset=offset, limit=limit)
+            metas = self.metadata_batch(paths)
+            return {p: metas.get(p) for p in paths}
+        if not resp.get("ok", False):
+            return {}
+        entries = resp.get("entries", {})
+        for p, value in entries.items():
+            self._meta_cache.put(p, value)
+        return entries
+
+    def delete_file(self, path: str) -> bool:
+        """
+        Delete a file. Returns False if the path did not exist.
+
+        The MDS entry goes first and hands back the block list, so there is
+        no separate get_meta round trip; a crash in between can leave only
+        orphaned blocks, never metadata pointing at deleted ones.
+        """
         resp = self._mds_rpc({"op": "delete_meta", "args": {"path": path}})
+        self._meta_cache.invalidate(path)
         if not resp.get("ok", False):
             raise RuntimeError(f"MDS delete_meta failed: {resp}")
+        meta = resp.get("value")
+        if not meta:
+            return False
+        blocks = meta.get("blocks", [])
+        n = self.DELETE_BATCH_MAX
+        self._parallel(self.delete_blocks, [blocks[i: i + n] for i in range(0, len(blocks), n)])
+        return True
+
+    def exists_batch(self, paths: List[str]) -> Dict[str, bool]:
+        """Existence check for many paths in one metadata_batch round trip."""
+        values = self.metadata_batch(paths)
+        return {p: values.get(p) is not None for p in paths}
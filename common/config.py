@@ -25,6 +25,8 @@ class Level0Config:
     journal_file: Path
     data_dir: Path
     log_dir: Path
+    # DataNode: write large blocks with O_DIRECT (see DataNodeStorage).
+    direct_io: bool = False
 
     @classmethod
     def from_file(cls, path: str | Path) -> "Level0Config":
@@ -39,6 +41,7 @@ class Level0Config:
             journal_file=root / cfg.get("journal_file", "mds_journal.log"),
             data_dir=root / cfg.get("data_dir", "data"),
             log_dir=root / cfg.get("log_dir", "logs"),
+            direct_io=bool(cfg.get("direct_io", False)),
         )
 
 
@@ -0,0 +1,96 @@
+"""
+Fixed-size pseudo-LRU cache using the CLOCK policy.
+
+Entries live in preallocated slots. Each slot has one reference byte in a
+bytearray: a hit sets it, and on eviction a hand sweeps forward clearing
+set bytes until it meets a clear one, whose entry is replaced. The sweep
+is a bytearray.find() for a zero byte, i.e. a memchr over the reference
+array, so no per-entry links are kept or relinked on every hit.
+
+Not thread-safe; callers that share an instance hold their own lock.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class ClockCache:
+    """Bounded map of key -> value with CLOCK (second-chance) eviction."""
+
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._index: Dict[Hashable, int] = {}
+        self._keys: List[Optional[Hashable]] = [None] * capacity
+        self._values: List[Any] = [None] * capacity
+        self._ref = bytearray(capacity)
+        self._free = list(range(capacity - 1, -1, -1))
+        self._hand = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        slot = self._index.get(key)
+        if slot is None:
+            return default
+        self._ref[slot] = 1
+        return self._values[slot]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        slot = self._index.get(key)
+        if slot is not None:
+            self._values[slot] = value
+            self._ref[slot] = 1
+            return
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._victim()
+            del self._index[self._keys[slot]]
+        # New entries start unreferenced: they earn a second chance only by
+        # being read again before the hand comes round.
+        self._index[key] = slot
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._ref[slot] = 0
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        slot = self._index.pop(key, None)
+        if slot is None:
+            return default
+        value = self._values[slot]
+        self._keys[slot] = None
+        self._values[slot] = None
+        self._ref[slot] = 0
+        self._free.append(slot)
+        return value
+
+    def clear(self) -> None:
+        n = self.capacity
+        self._index.clear()
+        self._keys = [None] * n
+        self._values = [None] * n
+        self._ref = bytearray(n)
+        self._free = list(range(n - 1, -1, -1))
+        self._hand = 0
+
+    def _victim(self) -> int:
+        # Clear reference bytes from the hand up to the first clear one; if
+        # there is none before the end, clear the rest and wrap around. The
+        # wrapped search always succeeds because the tail was just cleared.
+        ref, hand = self._ref, self._hand
+        i = ref.find(0, hand)
+        if i < 0:
+            ref[hand:] = bytes(len(ref) - hand)
+            i = ref.find(0)
+            ref[:i] = bytes(i)
+        else:
+            ref[hand:i] = bytes(i - hand)
+        self._hand = (i + 1) % len(ref)
+        return i
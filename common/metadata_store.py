@@ -4,13 +4,67 @@ Level 0 metadata storage.
 Simple in-memory dict backed by a JSON file.
 No durability guarantees by itself — journaling enforces correctness.
 All MDS metadata mutations must go through this layer.
+
+The file holds {"checkpoint": {...}, "entries": {...}}. The checkpoint is
+opaque here: the MDS records in it where in the journal the entries were
+taken, so recovery can start from the snapshot and replay only what came
+after. Files holding just the entries (the earlier layout) load with an
+empty checkpoint.
 """
 
 from __future__ import annotations
 
 import json
+import mmap
+import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+
+# Snapshots are compact JSON either way; orjson writes them many times faster.
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def _loads(data: bytes) -> Any:
+        return json.loads(data.decode("utf-8"))
+
+
+_SNAPSHOT_KEYS = {"checkpoint", "entries"}
+
+
+def _fsync_dir(path: Path) -> None:
+    # Makes a rename within the directory durable. Directories cannot be
+    # opened for fsync on Windows; there the rename is left to the OS.
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _load_file(f: BinaryIO) -> Any:
+    # orjson parses straight out of a read-only mapping of the page cache,
+    # so the snapshot is never copied onto the Python heap first. (An empty
+    # file cannot be mapped; it fails to parse like any other bad file.)
+    if orjson is None or os.fstat(f.fileno()).st_size == 0:
+        return _loads(f.read())
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            return orjson.loads(view)
+        finally:
+            view.release()
 
 
 class MetadataStore:
@@ -23,24 +77,87 @@ class MetadataStore:
     def __init__(self, path: Path):
         self.path = path
         self._meta: Dict[str, Any] = {}
+        # Saved and loaded with the entries; see the module docstring.
+        self.checkpoint: Dict[str, Any] = {}
+        # Sorted view of the keys for ordered/paginated listings; rebuilt
+        # lazily after the key set changes.
+        self._sorted: Optional[List[str]] = None
 
     def load(self) -> None:
-        if self.path.exists():
-            self._meta = json.loads(self.path.read_text())
+        try:
+            f = self.path.open("rb")
+        except FileNotFoundError:
+            snap: Any = {}
+        else:
+            with f:
+                snap = _load_file(f)
+        if isinstance(snap, dict) and snap.keys() == _SNAPSHOT_KEYS:
+            self._meta, self.checkpoint = snap["entries"], snap["checkpoint"]
         else:
-            self._meta = {}
+            self._meta, self.checkpoint = snap, {}
+        self._sorted = None
 
     def save(self) -> None:
-        # Full overwrite; atomicity guaranteed at Level 0 by journaling,
-        # not by this function.
-        self.path.write_text(json.dumps(self._meta, indent=2))
+        self.persist(self.prepare_snapshot())
+
+    def prepare_snapshot(self) -> bytes:
+        """
+        Encode a full snapshot of the current contents. Cheap next to
+        persist(), so callers can hold their lock for this step only.
+        """
+        # Compact separators: the file is not meant for reading by hand, and
+        # pretty-printing makes it half again as large and nearly three
+        # times slower to write.
+        return _dumps({"checkpoint": self.checkpoint, "entries": self._meta})
+
+    def persist(self, data: bytes) -> None:
+        """
+        Write a prepare_snapshot() result as the metadata file. It goes to a
+        temp file that is fsynced and renamed into place, so a crash mid-save
+        never leaves a torn file; the directory is fsynced after the rename
+        so the new file is what survives a crash. Durability of individual
+        mutations is still the journal's job.
+        """
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_dir(self.path.parent)
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._meta
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._meta)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow copy of every entry (one C-level dict copy)."""
+        return dict(self._meta)
 
     def get(self, key: str) -> Any:
         return self._meta.get(key)
 
     def put(self, key: str, value: Any) -> None:
+        if key not in self._meta:
+            self._sorted = None
         self._meta[key] = value
 
     def delete(self, key: str) -> None:
         if key in self._meta:
             del self._meta[key]
+            self._sorted = None
+
+    def clear(self) -> None:
+        self._meta.clear()
+        self.checkpoint = {}
+        self._sorted = None
+
+    def sorted_keys(self) -> List[str]:
+        if self._sorted is None:
+            self._sorted = sorted(self._meta)
+        return self._sorted
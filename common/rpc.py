@@ -5,14 +5,84 @@ Provides RpcConnection, a thin wrapper around a TCP socket that sends and
 receives newline-delimited JSON objects. Handles buffering, message framing,
 and JSON encoding/decoding so higher-level components can think in terms of
 Python dicts instead of raw bytes.
+
+A message may carry a binary blob: the JSON header gets a "blob_len" field
+and the raw bytes follow the newline, so block payloads travel without any
+base64 encoding.
+
+RpcConnectionPool keeps connections alive between calls. serve_rpc() runs a
+server for many such connections on one asyncio event loop. Both speak TCP
+or, for peers on the same host, a Unix-domain socket (an Address that is a
+filesystem path rather than a (host, port) pair), which skips the TCP stack.
+
+Encoding uses orjson when it is installed (several times faster than the
+stdlib on metadata-heavy traffic) and falls back to json otherwise; both
+produce the same compact JSON, so mixed clients and servers interoperate.
 """
 
 from __future__ import annotations
 
+import asyncio
+import io
 import json
+import os
 import socket
-from dataclasses import dataclass
-from typing import Any, Dict
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+
+# _dumps_line() returns one encoded message including its trailing newline.
+if orjson is not None:
+    def _dumps_line(msg: Dict[str, Any]) -> bytes:
+        # orjson writes the newline into the same buffer: no concat copy.
+        return orjson.dumps(msg, option=orjson.OPT_APPEND_NEWLINE)
+
+    _loads = orjson.loads
+else:
+    def _dumps_line(msg: Dict[str, Any]) -> bytes:
+        return (json.dumps(msg, separators=(",", ":")) + "\n").encode("utf-8")
+
+    _loads = json.loads
+
+
+# Blobs up to this size are sent in the same buffer as their header.
+_COALESCE_MAX = 64 * 1024
+# Buffers handed to one sendmsg() call (the usual IOV_MAX).
+_IOV_MAX = 1024
+# Bytes asked for by each recv() while waiting for a header line.
+_RECV_SIZE = 64 * 1024
+
+_TCP_FAMILIES = (socket.AF_INET, socket.AF_INET6)
+
+# A blob is one bytes-like object, or a sequence of them sent back to back.
+Blob = Union[bytes, bytearray, memoryview, Sequence[Union[bytes, bytearray, memoryview]]]
+
+
+def _encode_with_blob(msg: Dict[str, Any],
+                      blob: Blob) -> Tuple[bytes, List[memoryview], int]:
+    """Header line for msg carrying blob, the blob's byte views, and its length."""
+    parts = [blob] if isinstance(blob, (bytes, bytearray, memoryview)) else blob
+    views = [v for v in (memoryview(p).cast("B") for p in parts) if len(v)]
+    total = sum(len(v) for v in views)
+    return _dumps_line({**msg, "blob_len": total}), views, total
+
+
+def _set_nodelay(sock: Any) -> None:
+    """Disable Nagle's algorithm on sock if it is a TCP socket."""
+    if sock.family in _TCP_FAMILIES and hasattr(socket, "TCP_NODELAY"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class _ClosedBeforeReply(EOFError):
+    """The peer closed the connection before sending any of a message."""
 
 
 @dataclass
@@ -25,23 +95,86 @@ class RpcConnection:
     """
 
     sock: socket.socket
-    _buf: bytes = b""
+    _buf: bytearray = field(default_factory=bytearray)
+
+    def __post_init__(self) -> None:
+        # Each RPC is one small write followed by a wait for the reply, the
+        # pattern where Nagle's algorithm stalls on the peer's delayed ACK.
+        # Only clients wrap their sockets here; accepted server connections
+        # are asyncio transports and get the same in connection_made().
+        _set_nodelay(self.sock)
 
     def send(self, msg: Dict[str, Any]) -> None:
-        data = json.dumps(msg, separators=(",", ":")).encode("utf-8") + b"\n"
-        self.sock.sendall(data)
+        self.sock.sendall(_dumps_line(msg))
+
+    def send_with_blob(self, msg: Dict[str, Any], blob: Blob) -> None:
+        """
+        Send msg as the JSON header, followed by blob as raw bytes. blob may
+        be a sequence of buffers; they are sent back to back as one blob
+        without being joined first.
+        """
+        head, views, total = _encode_with_blob(msg, blob)
+        if total <= _COALESCE_MAX or not hasattr(self.sock, "sendmsg"):
+            self.sock.sendall(b"".join([head, *views]))
+            return
+        # Scatter-gather so large payloads are not copied into one buffer.
+        self._sendmsg_all([memoryview(head), *views])
+
+    def _sendmsg_all(self, views: List[memoryview]) -> None:
+        while views:
+            sent = self.sock.sendmsg(views[:_IOV_MAX])
+            done = 0
+            while done < len(views) and sent >= len(views[done]):
+                sent -= len(views[done])
+                done += 1
+            del views[:done]
+            if sent:
+                views[0] = views[0][sent:]
 
     def recv(self) -> Dict[str, Any]:
-        while b"\n" not in self._buf:
-            chunk = self.sock.recv(4096)
+        """Receive one message; any blob attached to it is discarded."""
+        return self.recv_with_blob()[0]
+
+    def recv_with_blob(self) -> Tuple[Dict[str, Any], bytes]:
+        """Receive one message and its blob (b"" when none was attached)."""
+        buf = self._buf
+        start = 0
+        # Scan only the bytes that arrived since the last look, so a long
+        # header line costs linear rather than quadratic time.
+        while (nl := buf.find(b"\n", start)) < 0:
+            start = len(buf)
+            chunk = self.sock.recv(_RECV_SIZE)
             if not chunk:
-                raise EOFError("Connection closed while waiting for RPC message")
-            self._buf += chunk
+                closed = _ClosedBeforeReply if not buf else EOFError
+                raise closed("Connection closed while waiting for RPC message")
+            buf += chunk
+
+        if nl == 0:
+            del buf[:1]
+            return {}, b""
+        msg = _loads(buf[:nl])
+        del buf[:nl + 1]
+        blob_len = msg.pop("blob_len", 0)
+        return msg, self._recv_exact(blob_len) if blob_len else b""
 
-        line, self._buf = self._buf.split(b"\n", 1)
-        if not line:
-            return {}
-        return json.loads(line.decode("utf-8"))
+    def _recv_exact(self, n: int) -> bytes:
+        buf = self._buf
+        if len(buf) >= n:
+            data = bytes(buf[:n])
+            del buf[:n]
+            return data
+        # One preallocated buffer, filled in place by recv_into.
+        data = bytearray(n)
+        view = memoryview(data)
+        have = len(buf)
+        view[:have] = buf
+        buf.clear()
+        while have < n:
+            got = self.sock.recv_into(view[have:])
+            if not got:
+                raise EOFError("Connection closed while waiting for RPC blob")
+            have += got
+        return data
 
     def close(self) -> None:
         try:
@@ -49,3 +182,354 @@ class RpcConnection:
         except OSError:
             pass
         self.sock.close()
+
+
+# A server address: (host, port) for TCP, or a Unix-domain socket path.
+Address = Union[Tuple[str, int], str]
+
+
+class RpcConnectionPool:
+    """
+    Kept-alive RpcConnections per server Address.
+
+    Each call() checks a connection out for the whole exchange, so
+    concurrent callers never share a socket; at most max_idle connections
+    per server are kept afterwards.
+    """
+
+    def __init__(self, max_idle: int = 16) -> None:
+        self.max_idle = max_idle
+        self._idle: Dict[Address, List[RpcConnection]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def connect(addr: Address) -> RpcConnection:
+        if isinstance(addr, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(addr)
+            except BaseException:
+                sock.close()
+                raise
+            return RpcConnection(sock)
+        return RpcConnection(socket.create_connection(addr))
+
+    def checkout(self, addr: Address) -> Tuple[RpcConnection, bool]:
+        """Return (connection, reused); reused is False for a fresh one."""
+        with self._lock:
+            idle = self._idle.get(addr)
+            if idle:
+                return idle.pop(), True
+        return self.connect(addr), False
+
+    def checkin(self, addr: Address, conn: RpcConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(addr, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    @staticmethod
+    def _send(conn: RpcConnection, msg: Dict[str, Any], blob: Optional[Blob]) -> None:
+        if blob is None:
+            conn.send(msg)
+        else:
+            conn.send_with_blob(msg, blob)
+
+    def call(self, addr: Address, msg: Dict[str, Any],
+             blob: Optional[Blob] = None) -> Tuple[Dict[str, Any], bytes]:
+        """
+        One request/response round trip on a pooled connection.
+
+        A reused connection the server has dropped while idle is retried
+        once on a fresh one, but only when the send failed or the connection
+        closed before any of the reply arrived. After any other failure the
+        request may have been applied, and it is not sent a second time.
+        """
+        conn, reused = self.checkout(addr)
+        sent = False
+        try:
+            try:
+                self._send(conn, msg, blob)
+                sent = True
+                result = conn.recv_with_blob()
+            except (OSError, EOFError) as e:
+                if not reused or (sent and not isinstance(e, _ClosedBeforeReply)):
+                    raise
+                conn.close()
+                conn = self.connect(addr)
+                self._send(conn, msg, blob)
+                result = conn.recv_with_blob()
+        except BaseException:
+            conn.close()
+            raise
+        self.checkin(addr, conn)
+        return result
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+
+# ------------------------------------------------------------
+# Server side
+# ------------------------------------------------------------
+# A reply blob may also include open binary files; they are pushed to the
+# socket with sendfile() and closed once sent.
+ReplyPart = Union[bytes, bytearray, memoryview, BinaryIO]
+ReplyBlob = Union[ReplyPart, Sequence[ReplyPart]]
+Reply = Tuple[Dict[str, Any], ReplyBlob]
+# handler(request, blob) -> (response, blob); an empty blob sends none. A
+# handler that has to block (disk writes, journal syncs) returns a Future
+# of that pair instead, completed from whatever thread does the work.
+# An exception from either becomes an {"ok": False, "error": ...} reply.
+Handler = Callable[[Dict[str, Any], bytes], Union[Reply, "Future[Reply]"]]
+
+# Longest header line a server buffers (batch requests carry many ids).
+_MAX_LINE = 64 * 1024 * 1024
+# Scratch buffer each connection receives into.
+_RECV_CHUNK = 64 * 1024
+# Blobs at least this large are received straight into their own buffer.
+_DIRECT_MIN = 64 * 1024
+# Files smaller than this are read and sent like bytes (see file_part());
+# sendfile() has a fixed cost that only pays off on larger ones.
+_SENDFILE_MIN = 64 * 1024
+# Parsed requests a connection may queue before reading is paused.
+_MAX_QUEUED = 16
+
+
+def file_part(f: BinaryIO, size: int) -> ReplyPart:
+    """
+    f as part of a reply blob. Small files are read and closed right away;
+    larger ones stay open and are sent with sendfile(), then closed. The
+    read can wait on the disk, so call this from a handler's worker thread
+    rather than on the loop.
+    """
+    if size >= _SENDFILE_MIN:
+        return f
+    with f:
+        return f.read()
+
+
+def _error_response(e: Exception) -> Dict[str, Any]:
+    return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+class _ServerProtocol(asyncio.BufferedProtocol):
+    """
+    One kept-alive server connection. Requests run one at a time in arrival
+    order, so responses go back in request order even when the client
+    pipelines. Large blobs are received with recv_into() directly into a
+    buffer of their exact size.
+    """
+
+    def __init__(self, handler: Handler) -> None:
+        self._handler = handler
+        self._scratch = memoryview(bytearray(_RECV_CHUNK))
+        self._buf = bytearray()  # received bytes not yet parsed
+        self._queue: Deque[Tuple[Dict[str, Any], bytes]] = deque()
+        # Message whose blob is still arriving: (msg, blob length).
+        self._head: Optional[Tuple[Dict[str, Any], int]] = None
+        self._blob: Optional[bytearray] = None  # large blob being filled
+        self._blob_have = 0
+        self._busy = False            # a reply is pending (Future or sendfile)
+        self._write_paused = False    # the transport's write buffer is full
+        self._read_paused = False
+        self._closed = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+        self._loop = asyncio.get_running_loop()
+        # Replies are small writes too (see RpcConnection). asyncio's own
+        # TCP transports already set this; other event loops need not.
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            _set_nodelay(sock)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._closed = True
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._blob is not None:
+            return memoryview(self._blob)[self._blob_have:]
+        return self._scratch
+
+    def buffer_updated(self, nbytes: int) -> None:
+        if self._blob is not None:
+            self._blob_have += nbytes
+            if self._blob_have < len(self._blob):
+                return
+            self._queue.append((self._head[0], self._blob))
+            self._head = self._blob = None
+        else:
+            self._buf += self._scratch[:nbytes]
+            self._parse()
+        self._process()
+
+    def pause_writing(self) -> None:
+        self._write_paused = True
+        self._flow_control()
+
+    def resume_writing(self) -> None:
+        self._write_paused = False
+        self._process()
+
+    def _parse(self) -> None:
+        """Move every complete message in _buf onto the queue."""
+        buf = self._buf
+        pos = 0
+        try:
+            while True:
+                if self._head is None:
+                    nl = buf.find(b"\n", pos)
+                    if nl < 0:
+                        if len(buf) - pos > _MAX_LINE:
+                            raise ValueError("RPC header line too long")
+                        return
+                    msg = _loads(buf[pos:nl]) if nl > pos else {}
+                    pos = nl + 1
+                    n = msg.pop("blob_len", 0)
+                    if not n:
+                        self._queue.append((msg, b""))
+                        continue
+                    self._head = msg, n
+                    if n >= _DIRECT_MIN:
+                        have = min(n, len(buf) - pos)
+                        blob = bytearray(n)
+                        blob[:have] = buf[pos:pos + have]
+                        pos += have
+                        if have < n:
+                            self._blob, self._blob_have = blob, have
+                            return
+                        self._queue.append((msg, blob))
+                        self._head = None
+                        continue
+                msg, n = self._head
+                if len(buf) - pos < n:
+                    return
+                self._queue.append((msg, bytes(buf[pos:pos + n])))
+                pos += n
+                self._head = None
+        finally:
+            del buf[:pos]
+
+    def _process(self) -> None:
+        while self._queue and not (self._busy or self._write_paused or self._closed):
+            try:
+                result = self._handler(*self._queue.popleft())
+            except Exception as e:
+                # A failing request gets an error reply; the connection, and
+                # the requests pipelined behind it, carry on.
+                self._reply(_error_response(e), b"")
+                continue
+            if not isinstance(result, Future):
+                self._reply(*result)
+                continue
+            # Hold back later requests until this one is answered; the loop
+            # keeps serving other connections meanwhile.
+            self._busy = True
+            result.add_done_callback(
+                lambda fut: self._loop.call_soon_threadsafe(self._finished, fut)
+            )
+        self._flow_control()
+
+    def _flow_control(self) -> None:
+        # Stop reading while replies cannot be written, or while a client
+        # pipelines far ahead of us.
+        pause = self._write_paused or len(self._queue) >= _MAX_QUEUED
+        if pause != self._read_paused and not self._closed:
+            self._read_paused = pause
+            if pause:
+                self._transport.pause_reading()
+            else:
+                self._transport.resume_reading()
+
+    def _finished(self, fut: "Future[Reply]") -> None:
+        self._busy = False
+        if self._closed:
+            return
+        try:
+            resp, out = fut.result()
+        except Exception as e:
+            resp, out = _error_response(e), b""
+        self._reply(resp, out)
+        self._process()
+
+    def _reply(self, resp: Dict[str, Any], out: ReplyBlob) -> None:
+        if not out:
+            self._transport.write(_dumps_line(resp))
+            return
+        parts = [out] if isinstance(out, (bytes, bytearray, memoryview, io.IOBase)) else list(out)
+        if not any(isinstance(p, io.IOBase) for p in parts):
+            head, views, _ = _encode_with_blob(resp, parts)
+            self._transport.writelines([head, *views])
+            return
+        self._busy = True
+        task = self._loop.create_task(self._send_files(resp, parts))
+        task.add_done_callback(self._files_sent)
+
+    async def _send_files(self, resp: Dict[str, Any], parts: List[ReplyPart]) -> None:
+        try:
+            items: List[Union[memoryview, Tuple[BinaryIO, int]]] = [
+                (p, os.fstat(p.fileno()).st_size) if isinstance(p, io.IOBase)
+                else memoryview(p).cast("B")
+                for p in parts
+            ]
+            total = sum(it[1] if isinstance(it, tuple) else len(it) for it in items)
+            self._transport.write(_dumps_line({**resp, "blob_len": total}))
+            for it in items:
+                if isinstance(it, tuple):
+                    await self._loop.sendfile(self._transport, it[0], 0, it[1])
+                elif it:
+                    self._transport.write(it)
+        finally:
+            for p in parts:
+                if isinstance(p, io.IOBase):
+                    p.close()
+
+    def _files_sent(self, task: "asyncio.Task[None]") -> None:
+        self._busy = False
+        error = None if task.cancelled() else task.exception()
+        if self._closed:
+            return
+        if error is not None:
+            self._transport.close()
+            raise error
+        self._process()
+
+
+def serve_rpc(host: str, port: int, handler: Handler, *, name: str,
+              ready: Optional[threading.Event] = None,
+              unix_path: Optional[str] = None) -> None:
+    """
+    Serve handler on host:port, or on the Unix-domain socket unix_path if
+    given, until the process exits. ready, if given, is set once the socket
+    is listening.
+
+    One event loop thread multiplexes every connection, so idle keep-alive
+    connections cost a socket rather than an OS thread each. Handlers run
+    on the loop and must not block; slow work goes to a thread of the
+    handler's choosing and comes back as a Future.
+    """
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        def factory() -> _ServerProtocol:
+            return _ServerProtocol(handler)
+
+        if unix_path is not None:
+            server = await loop.create_unix_server(factory, unix_path)
+            print(f"[{name}] Listening on {unix_path}")
+        else:
+            server = await loop.create_server(factory, host, port)
+            print(f"[{name}] Listening on {host}:{port}")
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
@@ -2,89 +2,137 @@
 DataNode RPC server for AegisFS.
 
 This module exposes the local block storage (DataNodeStorage) over a simple
-TCP-based JSON RPC protocol. The server accepts one RPC request per connection,
-executes the corresponding storage operation, and returns a JSON response.
+TCP-based JSON RPC protocol. Clients keep connections open and send requests
+one after another; each executes the corresponding storage operation and
+gets a JSON response.
 
 Supported RPC ops:
   - ping
-  - store_block(block_id, data_b64)
-  - read_block(block_id)
+  - store_block(block_id)           + blob: block data
+  - read_block(block_id)            -> blob: block data
   - delete_block(block_id)
+  - store_blocks(block_ids, sizes)  + blob: the blocks, concatenated
+  - read_blocks(block_ids)          -> sizes: [n | null, ...], blob: concatenated
+  - delete_blocks(block_ids)
+
+Block payloads travel as raw RPC blobs (see common.rpc), never as JSON text.
+The *_blocks variants carry many blocks per round trip.
 """
 
 from __future__ import annotations
 
-import base64
-import socket
+import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from common.config import load_level0_config
-from common.rpc import RpcConnection
+from common.rpc import ReplyBlob, file_part, serve_rpc
 from datanode.storage import DataNodeStorage
 
 
-def handle_request(store: DataNodeStorage, req: Dict[str, Any]) -> Dict[str, Any]:
-    op = req.get("op")
-    args = req.get("args", {})
-
-    if op == "ping":
-        return {"ok": True, "msg": "datanode_alive"}
-
-    if op == "store_block":
-        block_id = args["block_id"]
-        data_b64 = args["data_b64"]
-        data = base64.b64decode(data_b64.encode("ascii"))
-        store.write_block(block_id, data)
-        return {"ok": True}
-
-    if op == "read_block":
-        block_id = args["block_id"]
-        data = store.read_block(block_id)
-        if data is None:
-            return {"ok": False, "error": "not_found"}
-        data_b64 = base64.b64encode(data).decode("ascii")
-        return {"ok": True, "data_b64": data_b64}
-
-    if op == "delete_block":
-        block_id = args["block_id"]
+_BLOCKING_OPS = frozenset({
+    "store_block", "store_blocks", "read_block", "read_blocks", "delete_block", "delete_blocks",
+})
+
+
+Reply = Tuple[Dict[str, Any], ReplyBlob]
+
+
+def _op_ping(store: DataNodeStorage, args: Dict[str, Any], blob: bytes) -> Reply:
+    return {"ok": True, "msg": "datanode_alive"}, b""
+
+
+def _op_store_block(store: DataNodeStorage, args: Dict[str, Any], blob: bytes) -> Reply:
+    store.write_block(args["block_id"], blob)
+    return {"ok": True}, b""
+
+
+# Reads hand back open files: the RPC layer sends large ones with
+# sendfile(), so their data never passes through Python buffers.
+def _op_read_block(store: DataNodeStorage, args: Dict[str, Any], blob: bytes) -> Reply:
+    f = store.open_block(args["block_id"])
+    if f is None:
+        return {"ok": False, "error": "not_found"}, b""
+    return {"ok": True}, file_part(f, os.fstat(f.fileno()).st_size)
+
+
+def _op_delete_block(store: DataNodeStorage, args: Dict[str, Any], blob: bytes) -> Reply:
+    store.delete_block(args["block_id"])
+    return {"ok": True}, b""
+
+
+def _op_store_blocks(store: DataNodeStorage, args: Dict[str, Any], blob: bytes) -> Reply:
+    block_ids, sizes = args["block_ids"], args["sizes"]
+    # Check the split before writing anything.
+    if len(block_ids) != len(sizes) or sum(sizes) != len(blob):
+        return {"ok": False, "error": "bad_sizes"}, b""
+    view = memoryview(blob)
+    offset = 0
+    for block_id, size in zip(block_ids, sizes):
+        store.write_block(block_id, view[offset:offset + size])
+        offset += size
+    return {"ok": True}, b""
+
+
+def _op_read_blocks(store: DataNodeStorage, args: Dict[str, Any], blob: bytes) -> Reply:
+    sizes = []
+    parts = []
+    for block_id in args["block_ids"]:
+        f = store.open_block(block_id)
+        if f is None:
+            sizes.append(None)
+        else:
+            size = os.fstat(f.fileno()).st_size
+            sizes.append(size)
+            parts.append(file_part(f, size))
+    return {"ok": True, "sizes": sizes}, parts
+
+
+def _op_delete_blocks(store: DataNodeStorage, args: Dict[str, Any], blob: bytes) -> Reply:
+    for block_id in args["block_ids"]:
         store.delete_block(block_id)
-        return {"ok": True}
+    return {"ok": True}, b""
+
 
-    return {"ok": False, "error": f"unknown_op:{op}"}
+_OPS: Dict[str, Callable[[DataNodeStorage, Dict[str, Any], bytes], Reply]] = {
+    "ping": _op_ping,
+    "store_block": _op_store_block,
+    "read_block": _op_read_block,
+    "delete_block": _op_delete_block,
+    "store_blocks": _op_store_blocks,
+    "read_blocks": _op_read_blocks,
+    "delete_blocks": _op_delete_blocks,
+}
 
 
-def handle_client(conn_sock: socket.socket, store: DataNodeStorage) -> None:
-    conn = RpcConnection(conn_sock)
-    try:
-        req = conn.recv()
-        resp = handle_request(store, req)
-        conn.send(resp)
-    except EOFError:
-        pass
-    finally:
-        conn.close()
+def handle_request(store: DataNodeStorage, req: Dict[str, Any],
+                   blob: bytes = b"") -> Reply:
+    op = req.get("op")
+    fn = _OPS.get(op)
+    if fn is None:
+        return {"ok": False, "error": f"unknown_op:{op}"}, b""
+    return fn(store, req.get("args", {}), blob)
 
 
-def serve_datanode(host: str = "127.0.0.1", port: int = 9101) -> None:
+def serve_datanode(host: str = "127.0.0.1", port: int = 9101,
+                   ready: Optional[threading.Event] = None,
+                   unix_path: Optional[str] = None) -> None:
     cfg = load_level0_config()
-    store = DataNodeStorage(cfg.data_dir)
-
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((host, port))
-        s.listen()
-        print(f"[DataNode] Listening on {host}:{port}")
-        while True:
-            conn_sock, _ = s.accept()
-            t = threading.Thread(
-                target=handle_client,
-                args=(conn_sock, store),
-                daemon=True,
-            )
-            t.start()
+    store = DataNodeStorage(cfg.data_dir, direct_io=cfg.direct_io)
+
+    # Every op on block files goes to worker threads: writes fsync, deletes
+    # unlink, and reads open, fstat and (for small blocks) read each file,
+    # any of which can wait on the disk. Only ping is answered on the loop.
+    pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="datanode")
+
+    def handler(req: Dict[str, Any], blob: bytes) -> Any:
+        if req.get("op") in _BLOCKING_OPS:
+            return pool.submit(handle_request, store, req, blob)
+        return handle_request(store, req, blob)
 
+    serve_rpc(host, port, handler, name="DataNode", ready=ready, unix_path=unix_path)
 
 if __name__ == "__main__":
     serve_datanode()
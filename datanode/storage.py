@@ -7,6 +7,7 @@ data directory. The block store offers:
 
   - Deterministic mapping: <block_id> → <data_dir>/<block_id>.blk
   - Atomic writes using a temp-file + fsync + atomic replace pattern
+  - Optional O_DIRECT writes for large blocks, bypassing the page cache
   - Simple read and delete operations
   - No networking, no metadata logic, no client semantics
 
@@ -17,9 +18,11 @@ blocks should live; this module only ensures they are safely stored.
 
 from __future__ import annotations
 
+import errno
+import mmap
 import os
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Optional
 
 
 class DataNodeStorage:
@@ -30,9 +33,15 @@ class DataNodeStorage:
         <data_dir>/<block_id>.blk
     """
 
-    def __init__(self, data_dir: Path):
+    DIRECT_MIN = 1 << 20  # smallest block written with O_DIRECT
+    _ALIGN = 4096         # O_DIRECT buffer, offset and length alignment
+
+    def __init__(self, data_dir: Path, direct_io: bool = False):
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        # O_DIRECT skips the page-cache copy and dirty-page writeback for
+        # bulk writes; turned off for good if the filesystem rejects it.
+        self.direct_io = direct_io and hasattr(os, "O_DIRECT")
 
     def block_path(self, block_id: str) -> Path:
         return self.data_dir / f"{block_id}.blk"
@@ -41,18 +50,73 @@ class DataNodeStorage:
         path = self.block_path(block_id)
         tmp_path = path.with_suffix(".blk.tmp")
 
-        with tmp_path.open("wb") as f:
-            f.write(data)
-            f.flush()
-            os.fsync(f.fileno())
+        if not (self.direct_io and len(data) >= self.DIRECT_MIN
+                and self._write_direct(tmp_path, data)):
+            with tmp_path.open("wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
 
         tmp_path.replace(path)
 
+    def _write_direct(self, tmp_path: Path, data: bytes) -> bool:
+        """
+        Write data to tmp_path with O_DIRECT. Returns False, and disables
+        direct I/O, if the filesystem does not support it.
+        """
+        # O_DIRECT needs an aligned buffer and length: stage the block in an
+        # anonymous (page-aligned) mmap, write it padded, then trim the file
+        # back to the real size.
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o644)
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            self.direct_io = False
+            return False
+        n = len(data)
+        padded = -(-n // self._ALIGN) * self._ALIGN
+        try:
+            with mmap.mmap(-1, padded) as buf:
+                buf[:n] = data
+                view = memoryview(buf)
+                try:
+                    done = 0
+                    while done < padded:
+                        done += os.write(fd, view[done:])
+                    written = True
+                except OSError as e:
+                    # Some filesystems accept O_DIRECT on open and only
+                    # reject the writes.
+                    if e.errno != errno.EINVAL:
+                        raise
+                    written = False
+                finally:
+                    view.release()
+            if written:
+                os.ftruncate(fd, n)
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        if not written:
+            tmp_path.unlink(missing_ok=True)
+            self.direct_io = False
+        return written
+
     def read_block(self, block_id: str) -> Optional[bytes]:
-        path = self.block_path(block_id)
-        if not path.exists():
+        # One open() instead of a stat() and then an open().
+        try:
+            with self.block_path(block_id).open("rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def open_block(self, block_id: str) -> Optional[BinaryIO]:
+        """The block file opened for reading, or None if it does not exist."""
+        try:
+            return self.block_path(block_id).open("rb")
+        except FileNotFoundError:
             return None
-        return path.read_bytes()
 
     def delete_block(self, block_id: str) -> None:
         path = self.block_path(block_id)
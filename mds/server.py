@@ -1,86 +1,146 @@
 """
 Metadata Server TCP daemon (Level 1).
 
-Starts a JSON-RPC TCP server that accepts client requests (put_meta/get_meta),
-parses them via RpcConnection, and dispatches to MDSState. This exposes the
+Starts a JSON-RPC TCP server that accepts client requests (put_meta/get_meta/metadata_batch),
+serves them through common.rpc.serve_rpc, and dispatches to MDSState. This exposes the
 Level-0 journaled metadata engine over the network and forms the front-door
 API for clients and, later, DataNode coordination.
 """
 
 from __future__ import annotations
 
-import socket
 import threading
-from typing import Any, Dict
+from bisect import bisect_left
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from common.config import load_level0_config
-from common.rpc import RpcConnection
+from common.rpc import serve_rpc
 from mds.state import MDSState
 
 
-def handle_request(state: MDSState, req: Dict[str, Any]) -> Dict[str, Any]:
+_PAGE_ARGS = ("sorted", "prefix", "offset", "limit")
+
+# Ops that journal a mutation; their replies wait for the journal sync.
+_MUTATING_OPS = frozenset({"put_meta", "put_meta_batch", "delete_meta"})
+
+
+def _list_page(state: MDSState, args: Dict[str, Any]) -> Tuple[List[str], int]:
+    """Sorted keys under args["prefix"], sliced by offset/limit, plus the match count."""
+    keys = state.store.sorted_keys()
+    prefix = args.get("prefix") or ""
+    lo, hi = 0, len(keys)
+    if prefix:
+        lo = bisect_left(keys, prefix)
+        # First key past every string starting with prefix.
+        hi = bisect_left(keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+    start = lo + max(0, int(args.get("offset", 0)))
+    limit = args.get("limit")
+    stop = hi if limit is None else min(hi, start + int(limit))
+    return keys[start:stop], hi - lo
+
+
+def _op_ping(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    return {"ok": True, "msg": "mds_alive"}
+
+
+def _op_namespace_version(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    return {"ok": True, "version": state.namespace_version()}
+
+
+def _op_put_meta(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    state.put_metadata(args["path"], args["value"], wait=wait)
+    return {"ok": True}
+
+
+def _op_put_meta_batch(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    state.put_metadata_batch(args["items"], wait=wait)
+    return {"ok": True}
+
+
+def _op_get_meta(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    return {"ok": True, "value": state.store.get(args["path"])}
+
+
+def _op_metadata_batch(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    get = state.store.get
+    return {"ok": True, "values": {p: get(p) for p in args["paths"]}}
+
+
+def _op_delete_meta(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    prev = state.delete_metadata(args["path"], wait=wait)
+    return {"ok": True, "value": prev}
+
+
+# Optional args: sorted, prefix, offset, limit. Any of them switches to the
+# server-side sorted index so clients only receive one page.
+def _op_list_meta(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    if not any(k in args for k in _PAGE_ARGS):
+        return {"ok": True, "paths": list(state.store.keys())}
+    paths, total = _list_page(state, args)
+    return {"ok": True, "paths": paths, "total": total}
+
+
+# list + stat-all in one round trip; takes the same paging args as list_meta
+def _op_list_with_meta(state: MDSState, args: Dict[str, Any], wait: bool) -> Dict[str, Any]:
+    if not any(k in args for k in _PAGE_ARGS):
+        return {"ok": True, "entries": state.store.to_dict()}
+    paths, total = _list_page(state, args)
+    get = state.store.get
+    return {"ok": True, "entries": {p: get(p) for p in paths}, "total": total}
+
+
+_OPS: Dict[str, Callable[[MDSState, Dict[str, Any], bool], Dict[str, Any]]] = {
+    "ping": _op_ping,
+    "namespace_version": _op_namespace_version,
+    "put_meta": _op_put_meta,
+    "put_meta_batch": _op_put_meta_batch,
+    "get_meta": _op_get_meta,
+    "metadata_batch": _op_metadata_batch,
+    "delete_meta": _op_delete_meta,
+    "list_meta": _op_list_meta,
+    "list_with_meta": _op_list_with_meta,
+}
+
+
+def handle_request(state: MDSState, req: Dict[str, Any], *,
+                   wait: bool = True) -> Dict[str, Any]:
+    """
+    Execute one request. With wait=False, mutations return before their
+    journal sync; the caller defers the reply with state.when_durable().
+    """
     op = req.get("op")
-    args = req.get("args", {})
-
-    if op == "ping":
-        return {"ok": True, "msg": "mds_alive"}
-
-    if op == "put_meta":
-        path = args["path"]
-        value = args["value"]
-        state.put_metadata(path, value)
-        return {"ok": True}
-
-    if op == "get_meta":
-        path = args["path"]
-        value = state.store.get(path)
-        return {"ok": True, "value": value}
-
-    # NEW: delete metadata entry
-    if op == "delete_meta":
-        path = args["path"]
-        state.delete_metadata(path)
-        return {"ok": True}
-
-    # NEW: list all metadata keys (paths)
-    if op == "list_meta":
-        paths = list(state.store._meta.keys())
-        return {"ok": True, "paths": paths}
-
-    return {"ok": False, "error": f"unknown_op:{op}"}
-
-
-def handle_client(conn_sock: socket.socket, state: MDSState) -> None:
-    conn = RpcConnection(conn_sock)
-    try:
-        req = conn.recv()
-        resp = handle_request(state, req)
-        conn.send(resp)
-    except EOFError:
-        # client bailed, ignore
-        pass
-    finally:
-        conn.close()
-
-
-def serve_mds(host: str = "127.0.0.1", port: int = 9000) -> None:
+    fn = _OPS.get(op)
+    if fn is None:
+        return {"ok": False, "error": f"unknown_op:{op}"}
+    return fn(state, req.get("args", {}), wait)
+
+
+def serve_mds(host: str = "127.0.0.1", port: int = 9000,
+              ready: Optional[threading.Event] = None,
+              unix_path: Optional[str] = None) -> None:
     cfg = load_level0_config()
     state = MDSState.from_config(cfg)
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((host, port))
-        s.listen()
-        print(f"[MDS] Listening on {host}:{port}")
-        while True:
-            conn_sock, addr = s.accept()
-            t = threading.Thread(
-                target=handle_client,
-                args=(conn_sock, state),
-                daemon=True,
-            )
-            t.start()
-
+    def handler(req: Dict[str, Any], blob: bytes) -> Any:
+        if req.get("op") not in _MUTATING_OPS:
+            return handle_request(state, req), b""
+        # Apply on the event loop and reply once the journal writer has
+        # synced the commit, so concurrent clients share each fsync without
+        # a thread apiece waiting on it.
+        resp = handle_request(state, req, wait=False)
+        reply: Future = Future()
+
+        def durable(error: Optional[BaseException]) -> None:
+            if error is None:
+                reply.set_result((resp, b""))
+            else:
+                reply.set_exception(error)
+
+        state.when_durable(durable)
+        return reply
+
+    serve_rpc(host, port, handler, name="MDS", ready=ready, unix_path=unix_path)
 
 if __name__ == "__main__":
     serve_mds()
@@ -4,21 +4,43 @@ MDSState: the core of the Metadata Server.
 Wraps the write-ahead journal and the MetadataStore into a transactional,
 crash-safe state machine. All metadata mutations go through:
 
-    BEGIN → APPLY → store.put/save → COMMIT
+    (BEGIN → APPLY… → COMMIT) → store.put
 
-On startup, recover_from_journal() rebuilds metadata purely from the
-journal, ignoring any corrupted or partial snapshot files.
+where the journal records of one mutation are queued as a single append.
+
+The metadata file is only a snapshot: it is rewritten every
+SNAPSHOT_EVERY_OPS mutations or SNAPSHOT_INTERVAL seconds (and on close),
+not on every operation.
+
+On startup, recover_from_journal() loads the snapshot and replays the
+committed transactions the journal holds past it. A snapshot that is
+unreadable, or that this journal does not account for, is ignored and the
+metadata is rebuilt from the journal alone. Snapshots are written only
+once every commit they reflect is durable, so they never get ahead of the
+journal.
+
+Mutations run under a lock but wait for their COMMIT to be fsynced after
+releasing it, so concurrent requests are group-committed by the journal.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, Any, Set
-from collections import defaultdict
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, ClassVar, Dict, Optional
+from uuid import uuid4
 
 from common.config import Level0Config
 from common.metadata_store import MetadataStore
-from common.journal import Journal, JournalOp
+from common.journal import Journal, JournalOp, decode_data
+
+
+def _load_snapshot(store: MetadataStore) -> None:
+    try:
+        store.load()
+    except ValueError:
+        store.clear()  # torn or corrupt snapshot: rebuild
 
 
 @dataclass
@@ -26,49 +48,85 @@ class MDSState:
     """
     Level 0 MDS state: metadata + journal + recovery.
 
-    On startup we ignore any existing metadata file and rebuild it
-    purely from committed journal transactions.
+    On startup the metadata file is brought up to date from committed
+    journal transactions (or rebuilt from them, if it cannot be trusted).
     """
 
     cfg: Level0Config
     store: MetadataStore
     journal: Journal
+    # Namespace version: txid of the last applied commit, qualified by a
+    # per-process epoch so a reset journal can never repeat an old token.
+    last_txid: int = 0
+    epoch: str = field(default_factory=lambda: uuid4().hex[:8])
+    # Serializes journal order with store mutation; never held across fsync.
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    # Mutations since the metadata file was last written, and when that was.
+    _unsaved_ops: int = field(default=0, repr=False, compare=False)
+    _saved_at: float = field(default_factory=time.monotonic, repr=False, compare=False)
+    # Journal sequence number of the latest COMMIT.
+    _last_seq: int = field(default=0, repr=False, compare=False)
+    # Background thread writing the latest snapshot, if one is in flight.
+    _snapshotter: Optional[threading.Thread] = field(default=None, repr=False, compare=False)
+
+    SNAPSHOT_EVERY_OPS: ClassVar[int] = 1000
+    SNAPSHOT_INTERVAL: ClassVar[float] = 60.0
 
     @classmethod
     def from_config(cls, cfg: Level0Config) -> "MDSState":
-        journal = Journal(cfg.journal_file)
+        # The snapshot is loaded first so the journal only has to check its
+        # tail past the snapshot's checkpoint on open.
         store = MetadataStore(cfg.metadata_file)
+        _load_snapshot(store)
+        cp = store.checkpoint
+        resume = (cp["offset"], cp["crc"]) if "offset" in cp else None
+        journal = Journal(cfg.journal_file, resume=resume)
         state = cls(cfg=cfg, store=store, journal=journal)
-        state.recover_from_journal()
+        state.recover_from_journal(load=False)
         return state
 
-    def recover_from_journal(self) -> None:
+    def recover_from_journal(self, *, load: bool = True) -> None:
         """
-        Rebuild metadata from committed APPLY records. Only rebuilds from COMMIT and disregards else.
+        Bring metadata up to date from committed APPLY records, starting
+        from the snapshot when it can be trusted. Only rebuilds from COMMIT
+        and disregards else.
 
         APPLY records must have:
           - action: "put" or "delete"
           - key: path string
           - value: JSON-serializable dict (for put only)
+
+        load=False skips reading the snapshot when the store already holds
+        it.
         """
-        tx_applies = defaultdict(list)   # txid -> list[dict]
-        committed: Set[int] = set()
-        aborted: Set[int] = set()
-
-        for rec in self.journal.iter_records():
-            if rec.op is JournalOp.APPLY:
-                tx_applies[rec.txid].append(rec.data)
-            elif rec.op is JournalOp.COMMIT:
-                committed.add(rec.txid)
-            elif rec.op is JournalOp.ABORT:
-                aborted.add(rec.txid)
-
-        # Start from a clean in-memory metadata state.
-        self.store._meta.clear()
-
-        # Apply only committed, non-aborted transactions in txid order.
-        for txid in sorted(committed - aborted):
-            for act in tx_applies.get(txid, []):
+        if load:
+            _load_snapshot(self.store)
+
+        # The snapshot's checkpoint names the journal position it was taken
+        # at; every transaction before it is in the snapshot, every later
+        # one after it. If this journal does not hold that position (reset,
+        # or replaced), rebuild from the whole journal.
+        cp = self.store.checkpoint
+        start = cp.get("offset")
+        if start is None or not self.journal.holds_mark(start, cp.get("crc")):
+            self.store.clear()
+            start = None
+
+        # Pass 1: find the outcome of every transaction from the journal's
+        # op/txid columns; no record data is touched.
+        with self.journal.index(start) as idx:
+            winners = set(idx.txids_with(JournalOp.COMMIT))
+            winners.difference_update(idx.txids_with(JournalOp.ABORT))
+            self.last_txid = max(winners, default=self.store.checkpoint.get("txid", 0))
+
+            # Pass 2: apply the winners' APPLY records in txid order (stable,
+            # so records of one transaction keep their journal order). Only
+            # this data is ever parsed.
+            txids = idx.txids
+            applies = [i for i in idx.positions(JournalOp.APPLY) if txids[i] in winners]
+            applies.sort(key=txids.__getitem__)
+            for i in applies:
+                act = decode_data(idx.data(i))
                 action = act.get("action")
                 key = act.get("key")
                 if action == "put":
@@ -76,38 +134,145 @@ class MDSState:
                 elif action == "delete":
                     self.store.delete(key)
 
+        self._checkpoint()
         # Persist rebuilt state to disk.
         self.store.save()
+        self._unsaved_ops = 0
+        self._saved_at = time.monotonic()
+
+    def reload_from_disk(self) -> None:
+        """
+        Drop the in-memory metadata and recover it again from the snapshot
+        and journal on disk, as a restart would, but keeping this state's
+        open journal. Waits for queued commits and any in-flight snapshot
+        first, so only what a crash would lose is lost.
+        """
+        with self._lock:
+            if self._snapshotter is not None:
+                self._snapshotter.join()
+                self._snapshotter = None
+            self.journal.wait_durable(self._last_seq)
+            self.recover_from_journal()
 
     # ---------- Public Level 0 operations ----------
 
-    def put_metadata(self, path: str, value: dict) -> None:
+    def namespace_version(self) -> str:
+        """Opaque token that changes whenever any metadata is mutated."""
+        return f"{self.epoch}-{self.last_txid}"
+
+    def put_metadata(self, path: str, value: dict, *, wait: bool = True) -> None:
         """
         Create or update metadata for a path with journaling.
+        With wait=False, returns before the journal sync; see when_durable().
         """
-        txid = self.journal.begin("put", path=path)
-        self.journal.apply(txid, {
-            "action": "put",
-            "key": path,
-            "value": value,
-        })
-
-        self.store.put(path, value)
-        self.store.save()
+        with self._lock:
+            txid, seq = self.journal.log_transaction("put", [{
+                "action": "put",
+                "key": path,
+                "value": value,
+            }], path=path, sync=False)
 
-        self.journal.commit(txid)
+            self.store.put(path, value)
+            self._last_seq = seq
+            self.last_txid = max(self.last_txid, txid)
+            self._snapshot_if_needed()
+        if wait:
+            self.journal.wait_durable(seq)
 
-    def delete_metadata(self, path: str) -> None:
+    def put_metadata_batch(self, items: Dict[str, dict], *, wait: bool = True) -> None:
+        """
+        Create or update metadata for many paths in a single journaled
+        transaction: either every entry survives recovery or none does.
+        """
+        with self._lock:
+            txid, seq = self.journal.log_transaction("put_batch", [
+                {"action": "put", "key": path, "value": value}
+                for path, value in items.items()
+            ], count=len(items), sync=False)
+
+            for path, value in items.items():
+                self.store.put(path, value)
+            self._last_seq = seq
+            self.last_txid = max(self.last_txid, txid)
+            self._snapshot_if_needed()
+        if wait:
+            self.journal.wait_durable(seq)
+
+    def delete_metadata(self, path: str, *, wait: bool = True) -> dict | None:
         """
         Delete metadata for a path with journaling.
+        Returns the removed value, or None (and journals nothing) if the
+        path did not exist.
         """
-        txid = self.journal.begin("delete", path=path)
-        self.journal.apply(txid, {
-            "action": "delete",
-            "key": path,
-        })
+        with self._lock:
+            prev = self.store.get(path)
+            if prev is None:
+                return None
 
-        self.store.delete(path)
-        self.store.save()
+            txid, seq = self.journal.log_transaction("delete", [{
+                "action": "delete",
+                "key": path,
+            }], path=path, sync=False)
+
+            self.store.delete(path)
+            self._last_seq = seq
+            self.last_txid = max(self.last_txid, txid)
+            self._snapshot_if_needed()
+        if wait:
+            self.journal.wait_durable(seq)
+        return prev
+
+    def when_durable(self, fn: Callable[[Optional[BaseException]], None]) -> None:
+        """
+        Call fn(None) once every mutation made so far is durable, or
+        fn(error) if the journal failed; fn may run on the journal's writer
+        thread. Pairs with the mutations' wait=False.
+        """
+        self.journal.when_durable(self._last_seq, fn)
+
+    def _snapshot_if_needed(self) -> None:
+        # Caller holds _lock. Recovery rebuilds from the journal alone, so the
+        # snapshot can lag behind without any loss of durability. Only the
+        # encoding happens under the lock; the write and fsync run on a
+        # background thread, one snapshot at a time so an older one can
+        # never be renamed over a newer one.
+        self._unsaved_ops += 1
+        if (self._unsaved_ops >= self.SNAPSHOT_EVERY_OPS
+                or time.monotonic() - self._saved_at >= self.SNAPSHOT_INTERVAL):
+            if self._snapshotter is not None and self._snapshotter.is_alive():
+                return  # retried on the next mutation
+            self._checkpoint()
+            data = self.store.prepare_snapshot()
+            self._snapshotter = threading.Thread(
+                target=self._persist_snapshot, args=(data, self._last_seq),
+                name="mds-snapshot", daemon=True,
+            )
+            self._snapshotter.start()
+            self._unsaved_ops = 0
+            self._saved_at = time.monotonic()
+
+    def _checkpoint(self) -> None:
+        # Caller holds _lock (or is recovering): nothing is queued between
+        # the mark and the snapshot taken with it.
+        offset, crc = self.journal.mark()
+        self.store.checkpoint = {"txid": self.last_txid, "offset": offset, "crc": crc}
+
+    def _persist_snapshot(self, data: bytes, seq: int) -> None:
+        # The snapshot may include commits still queued in the journal; if
+        # it reached disk first, a crash would keep changes the journal
+        # lost. Write it only once they are durable.
+        self.journal.wait_durable(seq)
+        self.store.persist(data)
 
-        self.journal.commit(txid)
+    def close(self) -> None:
+        """Write a final snapshot if anything changed, then close the journal."""
+        with self._lock:
+            if self._snapshotter is not None:
+                self._snapshotter.join()
+                self._snapshotter = None
+            if self._unsaved_ops:
+                self.journal.wait_durable(self._last_seq)
+                self._checkpoint()
+                self.store.save()
+                self._unsaved_ops = 0
+        self.journal.close()
@@ -9,6 +9,8 @@ TESTS = [
     "tests.test_datanode_storage",
     "tests.test_datanode_rpc",
     "tests.test_end_to_end",
+    "tests.test_client_meta_cache",
+    "tests.test_lru_cache",
 ]
 
 def main():
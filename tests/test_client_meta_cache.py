@@ -0,0 +1,97 @@
+from __future__ import annotations
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from client.fs_client import AegisClient
+
+
+class FakeMDSClient(AegisClient):
+    """AegisClient whose MDS is an in-process dict; counts round trips."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.meta = {}
+        self.calls = 0
+
+    def _mds_rpc(self, msg):
+        self.calls += 1
+        args = msg.get("args", {})
+        if msg["op"] == "get_meta":
+            return {"ok": True, "value": self.meta.get(args["path"])}
+        if msg["op"] == "put_meta":
+            self.meta[args["path"]] = args["value"]
+            return {"ok": True}
+        if msg["op"] == "metadata_batch":
+            return {"ok": True, "values": {p: self.meta.get(p) for p in args["paths"]}}
+        return {"ok": False, "error": "unknown_op"}
+
+
+class OldMDSClient(FakeMDSClient):
+    """MDS that predates the metadata_batch op."""
+
+    def _mds_rpc(self, msg):
+        if msg["op"] == "metadata_batch":
+            self.calls += 1
+            return {"ok": False, "error": "unknown_op:metadata_batch"}
+        return super()._mds_rpc(msg)
+
+
+def run():
+    print("=== Client Metadata Cache Test ===")
+    c = FakeMDSClient()
+
+    # put_meta populates the cache: the following get is free.
+    c.put_meta("/a", {"size": 1})
+    calls = c.calls
+    assert c.get_meta("/a") == {"size": 1}
+    assert c.calls == calls
+
+    # Batch fetch fills the cache for every returned path.
+    c.meta["/b"] = {"size": 2}
+    c.metadata_batch(["/b", "/nope"])
+    calls = c.calls
+    assert c.get_meta("/b") == {"size": 2}
+    assert c.calls == calls
+
+    # Missing paths are not cached.
+    assert c.get_meta("/nope") is None
+    assert c.calls == calls + 1
+
+    # Expired entries go back to the MDS.
+    c2 = FakeMDSClient(meta_cache_ttl=0.0)
+    c2.put_meta("/a", {"size": 1})
+    calls = c2.calls
+    assert c2.get_meta("/a") == {"size": 1}
+    assert c2.calls == calls + 1
+
+    # The LRU bound evicts the least recently used path.
+    c3 = FakeMDSClient(meta_cache_limit=2)
+    for p in ("/x", "/y", "/z"):
+        c3.put_meta(p, {"p": p})
+    calls = c3.calls
+    c3.get_meta("/x")
+    assert c3.calls == calls + 1
+
+    # Without a batch op the client falls back to per-path lookups.
+    c4 = OldMDSClient(meta_cache_limit=0)
+    c4.meta.update({"/p": {"n": 1}, "/q": {"n": 2}})
+    assert c4.metadata_batch(["/q", "/p", "/r"]) == {
+        "/q": {"n": 2}, "/p": {"n": 1}, "/r": None,
+    }
+
+    # The cache keeps its own copy: changing the dict passed to put_meta, or
+    # one handed back by get_meta, does not change what later gets return.
+    c5 = FakeMDSClient()
+    meta = {"blocks": ["b0"], "size": 1}
+    c5.put_meta("/m", meta)
+    meta["blocks"].append("b1")
+    got = c5.get_meta("/m")
+    got["size"] = 99
+    got["blocks"].clear()
+    assert c5.get_meta("/m") == {"blocks": ["b0"], "size": 1}
+
+    print("PASS: Client metadata cache correct.")
+
+
+if __name__ == "__main__":
+    run()
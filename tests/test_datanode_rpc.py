@@ -5,7 +5,6 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 import socket
 import threading
 import tempfile
-import time
 from pathlib import Path
 
 from common.rpc import RpcConnection
@@ -19,46 +18,84 @@ def run():
         cfgfile.write_text(f'{{"root_dir": "{tmp}"}}')
         os.environ["AEGISFS_CONFIG"] = str(cfgfile)
 
+        ready = threading.Event()
         t = threading.Thread(
             target=serve_datanode,
-            kwargs={"host": "127.0.0.1", "port": 9201},
+            kwargs={"host": "127.0.0.1", "port": 9201, "ready": ready},
             daemon=True,
         )
         t.start()
-
-        # wait for server
-        for _ in range(30):
-            try:
-                s = socket.create_connection(("127.0.0.1", 9201))
-                break
-            except ConnectionRefusedError:
-                time.sleep(0.1)
-        else:
+        if not ready.wait(5):
             raise RuntimeError("DataNode server did not start in time")
 
-        conn = RpcConnection(s)
-        conn.send({
+        conn = RpcConnection(socket.create_connection(("127.0.0.1", 9201)))
+        conn.send_with_blob({
             "op": "store_block",
-            "args": {"block_id": "b5", "data": "XYZ"}
-        })
+            "args": {"block_id": "b5"}
+        }, b"XYZ")
         assert conn.recv()["ok"]
         conn.close()
 
         # read back
-        for _ in range(30):
-            try:
-                s2 = socket.create_connection(("127.0.0.1", 9201))
-                break
-            except ConnectionRefusedError:
-                time.sleep(0.1)
-
-        conn2 = RpcConnection(s2)
+        conn2 = RpcConnection(socket.create_connection(("127.0.0.1", 9201)))
         conn2.send({
             "op": "read_block",
             "args": {"block_id": "b5"}
         })
-        resp = conn2.recv()
-        assert resp["data"] == "XYZ"
+        resp, data = conn2.recv_with_blob()
+        assert resp["ok"] and data == b"XYZ"
+
+        # bulk ops on the same kept-alive connection, binary-safe
+        payload = [bytes(range(256)), b"", b"\n\x00tail"]
+        conn2.send_with_blob({
+            "op": "store_blocks",
+            "args": {"block_ids": ["m0", "m1", "m2"], "sizes": [len(p) for p in payload]}
+        }, b"".join(payload))
+        assert conn2.recv()["ok"]
+
+        conn2.send({
+            "op": "read_blocks",
+            "args": {"block_ids": ["m0", "missing", "m1", "m2"]}
+        })
+        resp, blob = conn2.recv_with_blob()
+        assert resp["sizes"] == [256, None, 0, 6]
+        assert blob == b"".join(payload)
+
+        # Sizes that do not split the blob are refused before any write.
+        for ids, sizes in ((["x0", "x1"], [3]), (["x0", "x1"], [3, 4])):
+            conn2.send_with_blob({
+                "op": "store_blocks", "args": {"block_ids": ids, "sizes": sizes}
+            }, b"abcdef")
+            assert conn2.recv() == {"ok": False, "error": "bad_sizes"}
+        conn2.send({"op": "read_blocks", "args": {"block_ids": ["x0"]}})
+        assert conn2.recv_with_blob()[0]["sizes"] == [None]
+
+        # Large blocks: received straight into their buffer, sent back with
+        # sendfile(), and framed correctly next to small ones.
+        big = os.urandom(300 * 1024)
+        conn2.send_with_blob({"op": "store_block", "args": {"block_id": "big"}}, big)
+        assert conn2.recv()["ok"]
+        conn2.send({"op": "read_block", "args": {"block_id": "big"}})
+        resp, data = conn2.recv_with_blob()
+        assert resp["ok"] and data == big
+        conn2.send({"op": "read_blocks", "args": {"block_ids": ["m0", "big", "m2"]}})
+        resp, blob = conn2.recv_with_blob()
+        assert resp["sizes"] == [256, len(big), 6]
+        assert blob == payload[0] + big + payload[2]
+        conn2.send({"op": "ping"})
+        assert conn2.recv()["ok"]
+        conn2.send({"op": "format_disk"})
+        assert conn2.recv() == {"ok": False, "error": "unknown_op:format_disk"}
+
+        # A request that raises, on the loop or in a worker, gets an error
+        # reply; the connection and the requests pipelined behind it go on.
+        conn2.send({"op": "read_block", "args": {}})
+        conn2.send({"op": "delete_block", "args": {}})
+        conn2.send({"op": "ping"})
+        assert conn2.recv() == {"ok": False, "error": "KeyError: 'block_id'"}
+        assert conn2.recv() == {"ok": False, "error": "KeyError: 'block_id'"}
+        assert conn2.recv()["ok"]
+        conn2.close()
 
         print("PASS: DataNode RPC correct.")
 
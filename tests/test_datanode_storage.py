@@ -3,6 +3,7 @@ import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from datanode.storage import DataNodeStorage
+import errno
 import tempfile
 from pathlib import Path
 
@@ -18,8 +19,39 @@ def run():
         store.write_block("b1", b"world")
         assert store.read_block("b1") == b"world"
 
+        with store.open_block("b1") as f:
+            assert f.read() == b"world"
+
         store.delete_block("b1")
         assert store.read_block("b1") is None
+        assert store.open_block("b1") is None
+
+        # Direct I/O pads to the alignment and trims back to the real size;
+        # small blocks, and filesystems without O_DIRECT, stay buffered.
+        direct = DataNodeStorage(Path(tmp) / "direct", direct_io=True)
+        big = os.urandom(DataNodeStorage.DIRECT_MIN + 123)
+        direct.write_block("big", big)
+        direct.write_block("small", b"tiny")
+        assert direct.read_block("big") == big
+        assert direct.read_block("small") == b"tiny"
+
+        # A filesystem that takes O_DIRECT on open but rejects the writes
+        # falls back to buffered writes, for this block and later ones.
+        # (Buffered writes go through a file object, not os.write.)
+        real_write = os.write
+
+        def reject_direct(fd, data):
+            raise OSError(errno.EINVAL, "Invalid argument")
+
+        if direct.direct_io:
+            os.write = reject_direct
+            try:
+                direct.write_block("fallback", big)
+            finally:
+                os.write = real_write
+            assert not direct.direct_io
+            assert direct.read_block("fallback") == big
+            assert not list(Path(tmp, "direct").glob("*.tmp"))
 
         print("PASS: DataNode storage correct.")
 
@@ -5,7 +5,6 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 import socket
 import threading
 import tempfile
-import time
 from pathlib import Path
 
 from common.rpc import RpcConnection
@@ -21,40 +20,30 @@ def run():
         os.environ["AEGISFS_CONFIG"] = str(cfg)
 
         # start both servers
+        mds_ready = threading.Event()
         threading.Thread(
             target=serve_mds,
-            kwargs={"host": "127.0.0.1", "port": 9300},
+            kwargs={"host": "127.0.0.1", "port": 9300, "ready": mds_ready},
             daemon=True,
         ).start()
 
+        dn_ready = threading.Event()
         threading.Thread(
             target=serve_datanode,
-            kwargs={"host": "127.0.0.1", "port": 9301},
+            kwargs={"host": "127.0.0.1", "port": 9301, "ready": dn_ready},
             daemon=True,
         ).start()
 
-        # wait for MDS
-        for _ in range(30):
-            try:
-                sm = socket.create_connection(("127.0.0.1", 9300))
-                break
-            except ConnectionRefusedError:
-                time.sleep(0.1)
-
-        # wait for DataNode
-        for _ in range(30):
-            try:
-                sd = socket.create_connection(("127.0.0.1", 9301))
-                break
-            except ConnectionRefusedError:
-                time.sleep(0.1)
+        assert mds_ready.wait(5) and dn_ready.wait(5), "servers did not start in time"
+        sm = socket.create_connection(("127.0.0.1", 9300))
+        sd = socket.create_connection(("127.0.0.1", 9301))
 
         # write block to datanode
         conn_dn = RpcConnection(sd)
-        conn_dn.send({
+        conn_dn.send_with_blob({
             "op": "store_block",
-            "args": {"block_id": "b100", "data": "HELLO"}
-        })
+            "args": {"block_id": "b100"}
+        }, b"HELLO")
         assert conn_dn.recv()["ok"]
         conn_dn.close()
 
@@ -68,20 +57,15 @@ def run():
         conn_mds.close()
 
         # read back from datanode
-        for _ in range(30):
-            try:
-                sr = socket.create_connection(("127.0.0.1", 9301))
-                break
-            except ConnectionRefusedError:
-                time.sleep(0.1)
+        sr = socket.create_connection(("127.0.0.1", 9301))
 
         conn_read = RpcConnection(sr)
         conn_read.send({
             "op": "read_block",
             "args": {"block_id": "b100"}
         })
-        resp = conn_read.recv()
-        assert resp["data"] == "HELLO"
+        resp, data = conn_read.recv_with_blob()
+        assert resp["ok"] and data == b"HELLO"
 
         print("PASS: End-to-end pipeline is correct.")
 
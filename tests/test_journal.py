@@ -2,9 +2,10 @@ from __future__ import annotations
 import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from common.journal import Journal, JournalOp
+from common.journal import Journal, JournalOp, _frame, decode_data
 from pathlib import Path
 import tempfile
+import threading
 
 
 def run():
@@ -23,6 +24,234 @@ def run():
         assert recs[1].op == JournalOp.APPLY
         assert recs[2].op == JournalOp.COMMIT
 
+        # Unsynced appends become durable together, in order.
+        tx2 = j.begin("put", path="/b", sync=False)
+        j.apply(tx2, {"action": "put", "key": "/b", "value": {}}, sync=False)
+        j.wait_durable(j.commit(tx2, sync=False))
+        recs = list(j.iter_records())
+        assert [r.txid for r in recs[3:]] == [tx2] * 3
+
+        # when_durable() reports from the writer thread, or at once when the
+        # record is already on disk.
+        fired = threading.Event()
+        seen = []
+        seq = j.commit(j.begin("put", path="/d", sync=False), sync=False)
+        j.when_durable(seq, lambda err: (seen.append(err), fired.set()))
+        assert fired.wait(5)
+        j.when_durable(seq, seen.append)
+        assert seen == [None, None]
+
+        # A logged transaction's records land together, in order.
+        tx3, seq3 = j.log_transaction("put", [{"key": "/e"}, {"key": "/f"}], path="/e")
+        assert [(r.txid, r.op, r.data) for r in j.iter_records()][-4:] == [
+            (tx3, JournalOp.BEGIN, {"op": "put", "path": "/e"}),
+            (tx3, JournalOp.APPLY, {"key": "/e"}),
+            (tx3, JournalOp.APPLY, {"key": "/f"}),
+            (tx3, JournalOp.COMMIT, {}),
+        ]
+        j.wait_durable(seq3)
+
+        # Concurrent committers share fsyncs; every record lands exactly once.
+        def worker():
+            for _ in range(20):
+                t = j.begin("put", path="/c", sync=False)
+                j.commit(t)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        j.close()
+
+        txids = [r.txid for r in Journal(jpath).iter_records()]
+        assert len(txids) == 12 + 4 * 20 * 2
+        assert len(set(txids)) == 4 + 4 * 20
+        assert Journal(jpath).new_txid() == max(txids) + 1
+
+        # A group window delays syncs, never drops or reorders records.
+        wpath = Path(tmp) / "windowed.log"
+        jw = Journal(wpath, group_window=0.005)
+        for _ in range(5):
+            jw.commit(jw.begin("put", path="/w", sync=False))
+        jw.close()
+        ops = [r.op for r in Journal(wpath).iter_records()]
+        assert ops == [JournalOp.BEGIN, JournalOp.COMMIT] * 5
+
+        # A torn tail is cut off on open; later appends stay readable.
+        with wpath.open("ab") as f:
+            f.write(b"\x40\x00\x00\x00garbage")
+        jt = Journal(wpath)
+        jt.commit(jt.begin("put", path="/t", sync=False))
+        jt.close()
+        assert len(list(Journal(wpath).iter_records())) == 12
+
+        # The txid is recovered when the last frame is a large one.
+        jb = Journal(wpath)
+        tb = jb.begin("put", path="/big", blob="x" * (200 * 1024))
+        jb.close()
+        assert Journal(wpath).new_txid() == tb + 1
+
+        # A journal that was never closed, as after a crash, ends in
+        # preallocated zeros: reopening cuts them off after the last record
+        # and appends there; close() trims the unused space.
+        jc = Journal(wpath)
+        tc = jc.begin("put", path="/crash")
+        cpath = Path(tmp) / "crashed.log"
+        cpath.write_bytes(wpath.read_bytes())
+        preallocated = hasattr(os, "posix_fallocate")
+        if preallocated:
+            assert cpath.stat().st_size >= Journal.PREALLOC
+        jr = Journal(cpath)
+        assert jr.new_txid() == tc + 1
+        jr.commit(tc)
+        jr.close()
+        assert [(r.txid, r.op) for r in Journal(cpath).iter_records()][-2:] == [
+            (tc, JournalOp.BEGIN), (tc, JournalOp.COMMIT),
+        ]
+        jc.close()
+        if preallocated:
+            assert cpath.stat().st_size < Journal.PREALLOC
+            assert wpath.stat().st_size < Journal.PREALLOC
+
+        # The same after a crash of a live, preallocated journal: whether the
+        # last frame was cut short or a range in the middle was never written
+        # back, reopening cuts the log after the last intact frame before
+        # the damage, and what is appended next survives a full scan.
+        kpath = Path(tmp) / "live.log"
+        jk = Journal(kpath)
+        ends = []
+        for _ in range(10):
+            jk.commit(jk.begin("put", path="/k", sync=False))
+            ends.append(jk.mark()[0])
+        crashed = kpath.read_bytes()
+        jk.close()
+        if preallocated:
+            assert len(crashed) >= Journal.PREALLOC
+        rpath = Path(tmp) / "recovered.log"
+        for first, last, kept in ((ends[8] + 5, len(crashed), 9), (ends[3], ends[5], 4)):
+            data = bytearray(crashed)
+            data[first:last] = bytes(last - first)
+            rpath.write_bytes(data)
+            jr = Journal(rpath)
+            assert rpath.stat().st_size == ends[kept - 1]
+            tr = jr.begin("put", path="/after")
+            assert tr == kept + 1
+            jr.commit(tr)
+            jr.close()
+            with Journal(rpath).index() as idx:
+                assert list(idx.txids_with(JournalOp.COMMIT)) == [*range(1, kept + 1), tr]
+
+        # A zeroed run inside the log, as writeback can leave after a crash,
+        # ends it: whatever follows was never acknowledged. Reopening cuts the
+        # log there, whether the hole is near the end or further back than
+        # the tail window, and later appends are what a full scan finds.
+        # (Zeros also pass the CRC check of an empty body; they must not be
+        # taken for a frame.)
+        for name, after in (("zeroed.log", ""), ("far-hole.log", "x" * 1024)):
+            zpath = Path(tmp) / name
+            jz = Journal(zpath)
+            for _ in range(5):
+                jz.commit(jz.begin("put", path="/z", sync=False), sync=False)
+            hole_start, _ = jz.mark()
+            for _ in range(5):
+                jz.commit(jz.begin("put", path="/z", sync=False), sync=False)
+            hole_end, _ = jz.mark()
+            for _ in range(100 if after else 1):
+                jz.commit(jz.begin("put", path="/z", blob=after, sync=False), sync=False)
+            jz.close()
+            with zpath.open("r+b") as f:
+                f.seek(hole_start)
+                f.write(bytes(hole_end - hole_start))
+            jz = Journal(zpath)
+            assert zpath.stat().st_size == hole_start
+            tz = jz.begin("put", path="/after")
+            assert tz == 6
+            jz.commit(tz)
+            jz.close()
+            with Journal(zpath).index() as idx:
+                assert list(idx.txids_with(JournalOp.COMMIT)) == [1, 2, 3, 4, 5, tz]
+
+        # Other damage with intact records after it is corruption of a synced
+        # log, not a crash: open refuses rather than cut acknowledged records
+        # off. The same damage in the last frame is a torn write and is cut.
+        fpath = Path(tmp) / "flipped.log"
+        jf = Journal(fpath)
+        for _ in range(5):
+            jf.commit(jf.begin("put", path="/f", sync=False), sync=False)
+        jf.close()
+        clean = fpath.read_bytes()
+        for at, intact in ((len(clean) // 2, None), (len(clean) - 6, 9)):
+            data = bytearray(clean)
+            data[at] ^= 0xFF
+            fpath.write_bytes(data)
+            try:
+                Journal(fpath).close()
+            except ValueError:
+                assert intact is None and fpath.read_bytes() == data
+            else:
+                assert len(list(Journal(fpath).iter_records())) == intact
+
+        # With resume, a mark from an earlier run, open checks only the log
+        # past the mark; numbering still continues past the records before
+        # it. A mark this log does not hold is ignored.
+        mpath = Path(tmp) / "resumed.log"
+        jm = Journal(mpath)
+        jm.commit(jm.begin("put", path="/m", sync=False))
+        first, _ = jm.mark()
+        jm.commit(jm.begin("put", path="/m", sync=False))
+        mark = jm.mark()
+        jm.commit(jm.begin("put", path="/m", sync=False))
+        jm.close()
+        size = mpath.stat().st_size
+        with mpath.open("r+b") as f:
+            f.seek(8)
+            f.write(bytes(first - 8))
+        jm = Journal(mpath, resume=mark)
+        assert mpath.stat().st_size == size and jm.new_txid() == 4
+        jm.close()
+        jm = Journal(mpath, resume=(mark[0], mark[1] ^ 1))
+        assert mpath.stat().st_size == 8 and jm.new_txid() == 1
+        jm.close()
+
+        # Journals in the old JSON-lines format are converted on open.
+        lpath = Path(tmp) / "legacy.log"
+        lpath.write_text(
+            '{"txid": 7, "op": "BEGIN", "data": {"op": "put"}}\n'
+            '{"txid": 7, "op": "COMMIT", "data": {}}\n'
+            '{"txid": 8, "op": "BEG'
+        )
+        jl = Journal(lpath)
+        assert [(r.txid, r.op) for r in jl.iter_records()] == [
+            (7, JournalOp.BEGIN), (7, JournalOp.COMMIT),
+        ]
+        assert jl.new_txid() == 8
+        jl.close()
+
+        # iter_raw() and index() leave data unparsed.
+        assert [(t, op, decode_data(d)) for t, op, d in Journal(lpath).iter_raw()] == [
+            (7, JournalOp.BEGIN, {"op": "put"}), (7, JournalOp.COMMIT, {}),
+        ]
+        with Journal(lpath).index() as idx:
+            assert list(idx.txids_with(JournalOp.COMMIT)) == [7]
+            assert list(idx.positions(JournalOp.BEGIN)) == [0]
+            assert decode_data(idx.data(0)) == {"op": "put"}
+
+        # Journals whose frames have all-JSON bodies (the first binary
+        # layout) are converted on open too.
+        vpath = Path(tmp) / "v1.log"
+        vpath.write_bytes(
+            b"AEGJRNL\x01"
+            + _frame(b'{"txid":9,"op":"BEGIN","data":{"op":"rm"}}')
+            + _frame(b'{"txid":9,"op":"ABORT","data":{}}')
+        )
+        jv = Journal(vpath)
+        assert [(r.txid, r.op, r.data) for r in jv.iter_records()] == [
+            (9, JournalOp.BEGIN, {"op": "rm"}), (9, JournalOp.ABORT, {}),
+        ]
+        assert jv.new_txid() == 10
+        jv.close()
+
         print("PASS: Journal append + replay is correct.")
 
 
@@ -21,7 +21,7 @@ def run_level0_smoke() -> None:
     # 1) MetadataStore basic persistence
     store = MetadataStore(cfg.metadata_file)
     store.load()
-    assert store._meta == {}
+    assert len(store) == 0
     store.put("/foo.txt", {"blocks": [0], "size": 10})
     store.save()
 
@@ -52,13 +52,13 @@ def run_level0_smoke() -> None:
 
     # 3) Recover MDS state purely from journal
     state = MDSState.from_config(cfg)
-    meta = state.store._meta
+    store = state.store
 
-    assert "/a.txt" in meta, "Committed file missing after recovery"
-    assert "/b.txt" not in meta, "Uncommitted file appeared after recovery"
+    assert "/a.txt" in store, "Committed file missing after recovery"
+    assert "/b.txt" not in store, "Uncommitted file appeared after recovery"
 
     print("Level 0 smoke test PASSED.")
-    print("Final metadata:", meta)
+    print("Final metadata:", store.to_dict())
 
 def run_level0_crash_simulation() -> None:
     cfg = load_level0_config()
@@ -71,21 +71,23 @@ def run_level0_crash_simulation() -> None:
 
     # Start MDS and perform ops via public API.
     state = MDSState.from_config(cfg)
-    state.put_metadata("/crash.txt", {"blocks": [7], "size": 777})
-    state.put_metadata("/keep.txt", {"blocks": [8], "size": 888})
+    state.put_metadata_batch({
+        "/crash.txt": {"blocks": [7], "size": 777},
+        "/keep.txt": {"blocks": [8], "size": 888},
+    })
 
     # Simulate crash: delete snapshot but KEEP journal.
     if cfg.metadata_file.exists():
         cfg.metadata_file.unlink()
 
-    # New MDS instance after "crash".
-    state2 = MDSState.from_config(cfg)
-    meta = state2.store._meta
+    # Recover the same MDS instance after "crash".
+    state.reload_from_disk()
+    store = state.store
 
-    assert "/crash.txt" in meta
-    assert "/keep.txt" in meta
+    assert "/crash.txt" in store
+    assert "/keep.txt" in store
     print("Crash simulation PASSED.")
-    print("Recovered metadata:", meta)
+    print("Recovered metadata:", store.to_dict())
 
 if __name__ == "__main__":
     run_level0_smoke()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from common.lru_cache import ClockCache
+
+
+def run():
+    print("=== CLOCK Cache Test ===")
+    c = ClockCache(3)
+    for k in ("a", "b", "c"):
+        c.put(k, k.upper())
+    assert len(c) == 3 and c.get("b") == "B"
+
+    # "b" was referenced, so the hand passes it over and evicts "a".
+    c.put("d", "D")
+    assert "a" not in c and "b" in c and "d" in c
+
+    # The hand moves on from "d": "b" spends its second chance and the
+    # unreferenced "c" goes. With "b"'s bit now clear, it goes next.
+    c.put("e", "E")
+    assert "c" not in c and "b" in c
+    c.get("d")
+    c.put("f", "F")
+    assert sorted(c._index) == ["d", "e", "f"]
+
+    # Every entry referenced: the hand wraps, clears all bits, and evicts
+    # the entry it started from.
+    for k in ("d", "e", "f"):
+        c.get(k)
+    c.put("g", "G")
+    assert len(c) == 3 and "g" in c
+
+    # Updates keep the slot; pop frees it for the next insert.
+    c.put("g", "G2")
+    assert c.get("g") == "G2"
+    assert c.pop("g") == "G2" and "g" not in c
+    assert c.pop("g", "gone") == "gone"
+    c.put("h", "H")
+    assert len(c) == 3 and c.get("h") == "H"
+
+    c.clear()
+    assert len(c) == 0 and c.get("h") is None
+
+    print("PASS: CLOCK cache correct.")
+
+
+if __name__ == "__main__":
+    run()
@@ -5,9 +5,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 import socket
 import threading
 import tempfile
-import time
 from pathlib import Path
-from common.rpc import RpcConnection
+from common.rpc import RpcConnectionPool
 from mds.server import serve_mds
 
 
@@ -18,48 +17,109 @@ def run():
         cfg_path.write_text(f'{{"root_dir": "{tmp}"}}')
         os.environ["AEGISFS_CONFIG"] = str(cfg_path)
 
+        # Served on a Unix-domain socket; the other server tests cover TCP.
+        sock_path = str(Path(tmp) / "mds.sock")
+        ready = threading.Event()
         t = threading.Thread(
             target=serve_mds,
-            kwargs={"host": "127.0.0.1", "port": 9100},
+            kwargs={"unix_path": sock_path, "ready": ready},
             daemon=True,
         )
         t.start()
-
-        # wait for server
-        for _ in range(30):
-            try:
-                s = socket.create_connection(("127.0.0.1", 9100))
-                break
-            except ConnectionRefusedError:
-                time.sleep(0.1)
-        else:
+        if not ready.wait(5):
             raise RuntimeError("MDS server did not start in time")
 
-        # put_meta
-        conn = RpcConnection(s)
-        conn.send({
+        # put_meta / get_meta / metadata_batch share one pooled connection.
+        addr = sock_path
+        pool = RpcConnectionPool()
+        resp, _ = pool.call(addr, {
             "op": "put_meta",
             "args": {"path": "/abc", "value": {"v": 1}}
         })
-        assert conn.recv()["ok"]
-        conn.close()
-
-        # get_meta
-        for _ in range(30):
-            try:
-                s2 = socket.create_connection(("127.0.0.1", 9100))
-                break
-            except ConnectionRefusedError:
-                time.sleep(0.1)
-
-        conn2 = RpcConnection(s2)
-        conn2.send({
+        assert resp["ok"]
+
+        resp2, _ = pool.call(addr, {
             "op": "get_meta",
             "args": {"path": "/abc"}
         })
-        resp2 = conn2.recv()
         assert resp2["value"] == {"v": 1}
 
+        resp3, _ = pool.call(addr, {
+            "op": "metadata_batch",
+            "args": {"paths": ["/abc", "/missing"]}
+        })
+        assert resp3["values"] == {"/abc": {"v": 1}, "/missing": None}
+        assert len(pool._idle[addr]) == 1
+        pool.close()
+
+        # list_with_meta
+        conn4 = RpcConnectionPool.connect(addr)
+        conn4.send({"op": "list_with_meta", "args": {}})
+        resp4 = conn4.recv()
+        assert resp4["entries"] == {"/abc": {"v": 1}}
+
+        # paged list_with_meta, on the same kept-alive connection
+        conn4.send({"op": "list_with_meta", "args": {"sorted": True, "prefix": "/a"}})
+        resp5 = conn4.recv()
+        assert resp5["entries"] == {"/abc": {"v": 1}} and resp5["total"] == 1
+        conn4.send({"op": "list_with_meta", "args": {"sorted": True, "prefix": "/z"}})
+        resp6 = conn4.recv()
+        assert resp6["entries"] == {} and resp6["total"] == 0
+
+        # Pipelined requests are answered in order: the read sees the write
+        # sent ahead of it on the same connection.
+        conn4.sock.sendall(
+            b'{"op":"put_meta","args":{"path":"/p","value":{"v":2}}}\n'
+            b'{"op":"get_meta","args":{"path":"/p"}}\n'
+            b'{"op":"ping"}\n'
+            b'{"op":"rename"}\n'
+        )
+        assert conn4.recv() == {"ok": True}
+        assert conn4.recv()["value"] == {"v": 2}
+        assert conn4.recv()["msg"] == "mds_alive"
+        assert conn4.recv() == {"ok": False, "error": "unknown_op:rename"}
+
+        # A pool reuses its idle connection, and reconnects once if the
+        # server side has gone away.
+        pool = RpcConnectionPool(max_idle=1)
+        ping = {"op": "get_meta", "args": {"path": "/abc"}}
+        assert pool.call(addr, ping)[0]["value"] == {"v": 1}
+        conn5, reused = pool.checkout(addr)
+        assert reused
+        conn5.sock.close()
+        pool.checkin(addr, conn5)
+        assert pool.call(addr, ping)[0]["value"] == {"v": 1}
+        pool.close()
+
+        # Once part of the reply has arrived the server has seen the request,
+        # so a connection lost then is an error, not a reason to resend.
+        fake_path = str(Path(tmp) / "fake.sock")
+        fake = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        fake.bind(fake_path)
+        fake.listen()
+        seen = []
+
+        def fake_server():
+            s, _ = fake.accept()
+            with s, s.makefile("rb") as requests:
+                seen.append(requests.readline())
+                s.sendall(b'{"ok":true}\n')
+                seen.append(requests.readline())
+                s.sendall(b'{"ok"')
+
+        threading.Thread(target=fake_server, daemon=True).start()
+        pool = RpcConnectionPool()
+        assert pool.call(fake_path, {"op": "ping"})[0] == {"ok": True}
+        try:
+            pool.call(fake_path, {"op": "put_meta"})
+        except EOFError:
+            pass
+        else:
+            raise AssertionError("call after a partial reply should fail")
+        assert len(seen) == 2
+        pool.close()
+        fake.close()
+
         print("PASS: MDS RPC works.")
 
 
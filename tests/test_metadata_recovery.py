@@ -2,6 +2,7 @@ from __future__ import annotations
 import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import json
 import tempfile
 from pathlib import Path
 from common.config import Level0Config
@@ -19,6 +20,10 @@ def cfg(root: str) -> Level0Config:
     )
 
 
+def snapshot(c: Level0Config) -> dict:
+    return json.loads(c.metadata_file.read_text())
+
+
 def run():
     print("=== Metadata Recovery Test ===")
     with tempfile.TemporaryDirectory() as tmp:
@@ -27,17 +32,67 @@ def run():
         state = MDSState.from_config(c)
         state.put_metadata("/x", {"size": 5})
         state.put_metadata("/y", {"size": 10})
+        state.put_metadata_batch({"/z1": {"size": 1}, "/z2": {"size": 2}})
 
         # simulate crash: delete snapshot metadata file
         if c.metadata_file.exists():
             c.metadata_file.unlink()
 
-        # rebuild from journal
-        state2 = MDSState.from_config(c)
-        meta = state2.store._meta
+        # rebuild from journal, in place
+        state.reload_from_disk()
+        store = state.store
+
+        assert "/x" in store
+        assert "/y" in store
+        assert store.get("/z1") == {"size": 1}
+        assert store.get("/z2") == {"size": 2}
+
+        # The snapshot is written on recovery and close, not on every op.
+        state.put_metadata("/w", {"size": 3})
+        assert "/w" not in snapshot(c)["entries"]
+        state.close()
+        assert snapshot(c)["entries"]["/w"] == {"size": 3}
+
+        # Periodic snapshots are encoded under the lock and written by a
+        # background thread.
+        state3 = MDSState.from_config(c)
+        state3.SNAPSHOT_EVERY_OPS = 2
+        state3.put_metadata("/v1", {"size": 4})
+        state3.put_metadata("/v2", {"size": 6})
+        state3._snapshotter.join()
+        assert snapshot(c)["entries"]["/v2"] == {"size": 6}
+        state3.close()
+
+        # Recovery starts from the snapshot and replays only the journal
+        # past its checkpoint: an edit made to the snapshot alone survives,
+        # and a put that never reached a snapshot comes back from the journal.
+        state4 = MDSState.from_config(c)
+        state4.put_metadata("/u", {"size": 7})
+        snap = snapshot(c)
+        assert snap["checkpoint"]["txid"] < state4.last_txid and "/u" not in snap["entries"]
+        snap["entries"]["/x"] = {"size": 50}
+        c.metadata_file.write_text(json.dumps(snap))
+        state5 = MDSState.from_config(c)
+        assert state5.store.get("/x") == {"size": 50}
+        assert state5.store.get("/u") == {"size": 7}
+        assert state5.last_txid == state4.last_txid
+        state5.close()
+
+        # A snapshot whose checkpoint the journal does not hold is not
+        # trusted.
+        snap = snapshot(c)
+        snap["checkpoint"]["offset"] -= 1
+        c.metadata_file.write_text(json.dumps(snap))
+        state6 = MDSState.from_config(c)
+        assert state6.store.get("/x") == {"size": 5}
+        assert state6.store.get("/u") == {"size": 7}
+        state6.close()
 
-        assert "/x" in meta
-        assert "/y" in meta
+        # Nor is one taken against a journal that has since been removed.
+        c.journal_file.unlink()
+        state7 = MDSState.from_config(c)
+        assert len(state7.store) == 0
+        state7.close()
 
         print("PASS: Metadata rebuild from journal correct.")
 